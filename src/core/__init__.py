@@ -1 +1,5 @@
-from .convention import FunctionTool, ExternalToolsHandler
+from .schema import function_tool
+from .convention import FunctionTool, ExternalToolsHandler, ConversationStore
+from .convention import UpdateQueue, IdempotencyStore, MetricsSink
+from .registry import ToolRegistry, RegisteredFunction
+from .tokens import estimate_tokens, trim_start
@@ -1,4 +1,10 @@
-from typing import Dict, List, Any, Literal, TypedDict
+import asyncio
+import inspect
+
+from types import MappingProxyType
+from typing import Dict, Hashable, List, Any, Literal, Mapping, Optional, Tuple
+from typing import TypedDict
+from .schema import TOOL_ATTRIBUTE
 
 
 class FunctionTool(TypedDict):
@@ -7,8 +13,28 @@ class FunctionTool(TypedDict):
 
 
 class ExternalToolsHandler:
+    # seconds a single function call may take before it is abandoned
+    TIMEOUT: float = 10.0
+    # tools declared with @function_tool, collected when the subclass is created
+    TOOLS: Tuple[FunctionTool, ...] = ()
+    FUNCTIONS: Mapping[str, str] = MappingProxyType({})
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        functions: Dict[str, str] = {}
+        tools: Dict[str, FunctionTool] = {}
+        for klass in reversed(cls.__mro__):
+            for attribute, value in vars(klass).items():
+                schema = getattr(value, TOOL_ATTRIBUTE, None)
+                if schema is not None:
+                    functions[schema["function"]["name"]] = attribute
+                    tools[schema["function"]["name"]] = schema
+        if functions:
+            cls.FUNCTIONS = MappingProxyType(functions)
+            cls.TOOLS = tuple(tools.values())
+
     def __init__(self):
-        self.tools: List[FunctionTool] = []
+        self.tools: List[FunctionTool] = list(self.TOOLS)
 
     def __repr__(self):
         functions = [tool["function"]["name"] for tool in self.tools]
@@ -19,7 +45,83 @@ class ExternalToolsHandler:
         return f"{self.__class__.__name__}({functions})"
 
     def has_function(self, name: str) -> bool:
-        pass
+        return name in self.FUNCTIONS
 
     def call_function(self, name: str, args: object) -> str:
+        if name not in self.FUNCTIONS:
+            return "Unknown function"
+        result = getattr(self, self.FUNCTIONS[name])(**args)
+        if inspect.isawaitable(result):
+            result = asyncio.run(result)
+        return result
+
+    async def call_function_async(self, name: str, args: object) -> str:
+        if name not in self.FUNCTIONS:
+            # run synchronous handlers on the thread pool to keep the event loop free
+            return await asyncio.to_thread(self.call_function, name, args)
+        function = getattr(self, self.FUNCTIONS[name])
+        if inspect.iscoroutinefunction(function):
+            return await function(**args)
+        return await asyncio.to_thread(function, **args)
+
+    def get_timeout(self, name: str) -> float:
+        return self.TIMEOUT
+
+    def get_cache_ttl(self, name: str, args: object) -> Optional[float]:
+        # seconds a result may be reused for, None if the call is not cacheable
+        return None
+
+    def is_cacheable_result(self, name: str, result: str) -> bool:
+        return True
+
+
+class ConversationStore:
+    def load(self, chat_id: Hashable) -> List[Dict[str, Any]]:
+        pass
+
+    def append(self, chat_id: Hashable, messages: List[Dict[str, Any]]) -> None:
+        pass
+
+    def replace(self, chat_id: Hashable, messages: List[Dict[str, Any]]) -> None:
+        pass
+
+    def clear(self, chat_id: Hashable) -> None:
+        pass
+
+    def token_count(self, chat_id: Hashable) -> int:
+        pass
+
+    def trim(self, chat_id: Hashable, max_tokens: int) -> int:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+
+class UpdateQueue:
+    async def put(self, update: Dict[str, Any]) -> None:
+        pass
+
+    async def get(self, timeout: float = None) -> Optional[Dict[str, Any]]:
+        pass
+
+    async def ack(self, update: Dict[str, Any]) -> None:
+        pass
+
+
+class IdempotencyStore:
+    def add(self, key: Hashable, ttl: float) -> bool:
+        """
+        Record `key` for `ttl` seconds; returns False if it is already recorded.
+        """
+        pass
+
+
+class MetricsSink:
+    def record(
+        self, name: str, value: float, unit: str, dimensions: Dict[str, str]
+    ) -> None:
+        pass
+
+    def flush(self) -> None:
         pass
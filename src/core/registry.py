@@ -0,0 +1,88 @@
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Tuple, Type
+
+from .convention import ExternalToolsHandler, FunctionTool
+
+
+class RegisteredFunction(NamedTuple):
+    call: Callable[[Dict[str, Any]], Awaitable[str]]
+    timeout: float
+
+
+class ToolRegistry:
+    """
+    Maps function names to bound handler calls, built once at registration.
+    """
+
+    def __init__(self):
+        self.tools: Tuple[FunctionTool, ...] = ()
+        self._handlers: Dict[int, Any] = {}
+        self._functions: Dict[str, RegisteredFunction] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._functions
+
+    def __len__(self) -> int:
+        return len(self._functions)
+
+    def get(self, name: str) -> RegisteredFunction:
+        return self._functions.get(name)
+
+    def register(self, handler: ExternalToolsHandler) -> bool:
+        """
+        Register all tools of a handler; returns False if it was already registered.
+        """
+        if id(handler) in self._handlers:
+            return False
+
+        names = self._check_names(handler.tools, handler)
+        for name in names:
+            self._functions[name] = RegisteredFunction(
+                partial(handler.call_function_async, name),
+                handler.get_timeout(name),
+            )
+        self._handlers[id(handler)] = handler
+        self.tools = self.tools + tuple(handler.tools)
+        return True
+
+    def register_deferred(
+        self,
+        handler_class: Type[ExternalToolsHandler],
+        factory: Callable[[], ExternalToolsHandler] = None,
+    ) -> bool:
+        """
+        Register the tools a handler class declares, constructing the handler
+        only when one of its functions is first called.
+        """
+        if id(handler_class) in self._handlers:
+            return False
+
+        names = self._check_names(handler_class.TOOLS, handler_class.__name__)
+        resolver = _DeferredHandler(factory or handler_class)
+        for name in names:
+            self._functions[name] = RegisteredFunction(
+                partial(resolver.call_function_async, name), handler_class.TIMEOUT
+            )
+        self._handlers[id(handler_class)] = handler_class
+        self.tools = self.tools + tuple(handler_class.TOOLS)
+        return True
+
+    def _check_names(self, tools: List[FunctionTool], owner: Any) -> List[str]:
+        names = [tool["function"]["name"] for tool in tools]
+        seen = set(self._functions)
+        for name in names:
+            if name in seen:
+                raise ValueError(f"Duplicate tool name {name!r} in {owner}")
+            seen.add(name)
+        return names
+
+
+class _DeferredHandler:
+    def __init__(self, factory: Callable[[], ExternalToolsHandler]):
+        self.factory = factory
+        self.handler: ExternalToolsHandler = None
+
+    async def call_function_async(self, name: str, args: Dict[str, Any]) -> str:
+        if self.handler is None:
+            self.handler = self.factory()
+        return await self.handler.call_function_async(name, args)
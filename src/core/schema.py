@@ -0,0 +1,88 @@
+import inspect
+import types
+import typing
+
+from typing import Any, Callable, Dict, TypeVar
+
+# attribute holding the generated schema on functions declared as tools
+TOOL_ATTRIBUTE = "__function_tool__"
+
+JSON_TYPES = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    dict: "object",
+    list: "array",
+}
+
+_Function = TypeVar("_Function", bound=Callable[..., Any])
+
+
+def function_tool(
+    description: str, name: str = None, **parameters: str
+) -> Callable[[_Function], _Function]:
+    """
+    Declare a handler method as a tool the model can call.
+
+    The JSON schema is generated once from the method signature when the
+    module is imported; `parameters` maps argument names to descriptions.
+    """
+
+    def decorator(function: _Function) -> _Function:
+        setattr(
+            function,
+            TOOL_ATTRIBUTE,
+            _build_schema(function, description, name, parameters),
+        )
+        return function
+
+    return decorator
+
+
+def _build_schema(
+    function: Callable[..., Any],
+    description: str,
+    name: str,
+    descriptions: Dict[str, str],
+) -> Dict[str, Any]:
+    hints = typing.get_type_hints(function)
+    properties = {}
+    for parameter in inspect.signature(function).parameters.values():
+        if parameter.name == "self":
+            continue
+        properties[parameter.name] = {
+            "type": _json_type(hints.get(parameter.name, str)),
+            "description": descriptions.get(parameter.name, ""),
+        }
+
+    unknown = set(descriptions) - set(properties)
+    if unknown:
+        raise TypeError(f"{function.__qualname__} has no parameters {sorted(unknown)}")
+
+    return {
+        "type": "function",
+        "function": {
+            "name": name or function.__name__,
+            "description": description,
+            "parameters": {
+                "type": "object",
+                "properties": properties,
+                # strict mode requires every property to be listed as required
+                "required": list(properties),
+                "additionalProperties": False,
+            },
+            "strict": True,
+        },
+    }
+
+
+def _json_type(annotation: Any) -> str:
+    # unwrap Optional[X] and X | None to X
+    if typing.get_origin(annotation) in [typing.Union, types.UnionType]:
+        members = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        annotation = members[0]
+    annotation = typing.get_origin(annotation) or annotation
+    if annotation not in JSON_TYPES:
+        raise TypeError(f"Unsupported tool parameter type: {annotation!r}")
+    return JSON_TYPES[annotation]
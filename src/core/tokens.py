@@ -0,0 +1,38 @@
+from typing import Any, Dict, List
+
+# rough average of characters per token for English text with the GPT tokenizers
+CHARS_PER_TOKEN = 4
+# fixed cost of the role and separators the API adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(message: Dict[str, Any]) -> int:
+    """
+    Estimate the prompt tokens a chat message costs without tokenizing it.
+    """
+    chars = len(message.get("content") or "")
+    for tool_call in message.get("tool_calls") or []:
+        function = tool_call["function"]
+        chars += len(function["name"]) + len(function["arguments"])
+    return MESSAGE_OVERHEAD_TOKENS + -(-chars // CHARS_PER_TOKEN)
+
+
+def trim_start(roles: List[str], tokens: List[int], max_tokens: int) -> int:
+    """
+    Index of the first message to keep so the history fits in `max_tokens`.
+
+    Histories are only cut in front of a non-tool message, so tool results
+    always stay together with the assistant message that requested them.
+    The most recent message group is always kept, even if it is over budget.
+    """
+    full = total = sum(tokens)
+    start = 0
+    dropped = 0
+    for index in range(1, len(roles)):
+        if total <= max_tokens:
+            break
+        dropped += tokens[index - 1]
+        if roles[index] != "tool":
+            start = index
+            total = full - dropped
+    return start
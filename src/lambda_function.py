@@ -1,55 +1,218 @@
 import os
 import json
-import asyncio
 
-from transformers import OpenAIChatBot
-from utils import LambdaLogger, TimeTools, WebTools
-from telegram_bot import TelegramMessage, FohlFehBot, LambdaRequestParser
+from typing import TYPE_CHECKING
 
-# Set up logging
-logger = LambdaLogger()
+from transformers import OpenAIChatBot, RequestGuard, ModelRouter, RoutingRule
+from storage import InMemoryConversationStore, SQLiteConversationStore
+from storage import SQLiteUpdateQueue, SQLiteIdempotencyStore
+from utils import LambdaLogger, TimeTools, WebTools, TTLCache, CachedToolsHandler
+from utils import EventLoopRunner, ResponseCache, EMFSink, metrics
 
+if TYPE_CHECKING:
+    from telegram_bot import TelegramMessage, FohlFehBot
 
-# Get the bot token from environment variables
+# Set up logging, sampling the info and debug lines of noisy loggers, e.g.
+# LOG_SAMPLING='{"OpenAIChatBot": 0.1}' keeps them for 10% of the requests
+logger = LambdaLogger(
+    os.getenv("LOG_LEVEL"),
+    int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000")),
+    json.loads(os.getenv("LOG_SAMPLING", "{}")),
+)
+
+
+# Get the bot configuration from environment variables
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+BOT_USERNAME = os.getenv("BOT_USERNAME")
+# Bot API endpoint up to the token, for a local Bot API server
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
 GPT_TOKEN = os.getenv("GPT_TOKEN")
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH")
+STREAM_REPLIES = os.getenv("STREAM_REPLIES", "").lower() in ["1", "true", "yes"]
+USE_UVLOOP = os.getenv("USE_UVLOOP", "").lower() in ["1", "true", "yes"]
+# when set, seen update ids are shared with other containers through this file
+IDEMPOTENCY_DB_PATH = os.getenv("IDEMPOTENCY_DB_PATH")
+# when set, webhooks are only queued here and processed by `worker_handler`
+UPDATE_QUEUE_PATH = os.getenv("UPDATE_QUEUE_PATH")
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "8"))
+# turns processed at once across chats, and how long to wait for message bursts
+MAX_CONCURRENT_TURNS = int(os.getenv("MAX_CONCURRENT_TURNS", "16"))
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", "0"))
+# messages sent per second to a chat and overall, Telegram's limits by default
+TELEGRAM_CHAT_MESSAGES_PER_SECOND = float(
+    os.getenv("TELEGRAM_CHAT_MESSAGES_PER_SECOND", "1")
+)
+TELEGRAM_MESSAGES_PER_SECOND = float(os.getenv("TELEGRAM_MESSAGES_PER_SECOND", "30"))
+# client-side limits of requests to the OpenAI API, unlimited when unset
+OPENAI_REQUESTS_PER_MINUTE = float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "0"))
+OPENAI_TOKENS_PER_MINUTE = float(os.getenv("OPENAI_TOKENS_PER_MINUTE", "0"))
+# seconds replies to standalone prompts are reused, disabled when unset, and
+# the prompt similarity above which a cached reply is reused, exact when unset
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "0"))
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0"))
+# rules routing turns to models, e.g. [{"model": "gpt-4o", "min_prompt_tokens":
+# 500}], and the models retried when another fails, e.g. {"gpt-4o": "gpt-4o-mini"}
+MODEL_ROUTES = json.loads(os.getenv("MODEL_ROUTES", "[]"))
+MODEL_FALLBACKS = json.loads(os.getenv("MODEL_FALLBACKS", "{}"))
+# work allowed to answer one message before the model must reply
+MAX_TOOL_ROUNDS = int(os.getenv("MAX_TOOL_ROUNDS", "5"))
+MAX_TURN_SECONDS = float(os.getenv("MAX_TURN_SECONDS", "30"))
+MAX_TURN_TOKENS = int(os.getenv("MAX_TURN_TOKENS", "20000"))
+# write per-stage timings and token counts as CloudWatch EMF log lines
+EMIT_METRICS = os.getenv("EMIT_METRICS", "").lower() in ["1", "true", "yes"]
+# defer importing and building the Telegram bot until the first update arrives
+LAZY_STARTUP = os.getenv("LAZY_STARTUP", "").lower() in ["1", "true", "yes"]
+
+
+# Metrics are buffered during an invocation and written when it ends
+if EMIT_METRICS:
+    metrics.sink = EMFSink()
+
+
+# Keep one event loop for the lifetime of the container, so the OpenAI and
+# Telegram HTTP clients bound to it reuse their connections across invocations
+runner = EventLoopRunner(use_uvloop=USE_UVLOOP)
+
+
+# Initialize the conversation store, persisted when a database path is set
+if HISTORY_DB_PATH:
+    conversation_store = SQLiteConversationStore(HISTORY_DB_PATH)
+else:
+    conversation_store = InMemoryConversationStore()
+
+
+# Initialize the update queue used to acknowledge webhooks before processing
+update_queue = SQLiteUpdateQueue(UPDATE_QUEUE_PATH) if UPDATE_QUEUE_PATH else None
 
 
-# Initialize the GPT model
-language_model = OpenAIChatBot(GPT_TOKEN)
-language_model.register_external_tools(TimeTools())
-language_model.register_external_tools(WebTools())
+# Initialize the GPT model, tool handlers are only built when first called
+language_model = OpenAIChatBot(
+    GPT_TOKEN,
+    conversation_store,
+    RequestGuard(
+        requests_per_minute=OPENAI_REQUESTS_PER_MINUTE,
+        tokens_per_minute=OPENAI_TOKENS_PER_MINUTE,
+    ),
+    (
+        ResponseCache(ttl=RESPONSE_CACHE_TTL, similarity=RESPONSE_CACHE_SIMILARITY)
+        if RESPONSE_CACHE_TTL > 0
+        else None
+    ),
+    ModelRouter(
+        [RoutingRule(**route) for route in MODEL_ROUTES], fallbacks=MODEL_FALLBACKS
+    ),
+    MAX_TOOL_ROUNDS,
+    MAX_TURN_SECONDS,
+    MAX_TURN_TOKENS,
+)
+runner.add_shutdown_callback(language_model.aclose)
+tools_cache = TTLCache()
+language_model.register_deferred_tools(
+    TimeTools, lambda: CachedToolsHandler(TimeTools(), tools_cache)
+)
+language_model.register_deferred_tools(
+    WebTools, lambda: CachedToolsHandler(WebTools(), tools_cache)
+)
 
 
-async def on_private_message(message: TelegramMessage) -> None:
+async def on_private_message(message: "TelegramMessage") -> None:
     try:
-        return await language_model.send_message(message.text)
+        return await language_model.send_message(message.chatid, message.text)
     except Exception as e:
         logger.error(f"Error in translate handler: {e}", exc_info=True)
 
 
+async def on_private_message_stream(message: "TelegramMessage"):
+    try:
+        async for chunk in language_model.stream_message(message.chatid, message.text):
+            yield chunk
+    except Exception as e:
+        logger.error(f"Error in stream handler: {e}", exc_info=True)
+
+
+def build_bot() -> "FohlFehBot":
+    from telegram_bot import (
+        FohlFehBot,
+        UpdateDeduplicator,
+        ChatScheduler,
+        OutboundSender,
+    )
+
+    if IDEMPOTENCY_DB_PATH:
+        deduplicator = UpdateDeduplicator(SQLiteIdempotencyStore(IDEMPOTENCY_DB_PATH))
+    else:
+        deduplicator = UpdateDeduplicator()
+
+    scheduler = ChatScheduler(MAX_CONCURRENT_TURNS, COALESCE_WINDOW)
+    sender = OutboundSender(
+        chat_rate=TELEGRAM_CHAT_MESSAGES_PER_SECOND,
+        global_rate=TELEGRAM_MESSAGES_PER_SECOND,
+    )
+    bot = FohlFehBot(
+        BOT_TOKEN, BOT_USERNAME, deduplicator, scheduler, TELEGRAM_API_URL, sender
+    )
+    bot.add_private_message_handler(on_private_message)
+    if STREAM_REPLIES:
+        bot.add_private_message_stream_handler(on_private_message_stream)
+    runner.add_shutdown_callback(bot.shutdown)
+    return bot
+
+
+def get_bot() -> "FohlFehBot":
+    global bot
+    if bot is None:
+        bot = build_bot()
+    return bot
+
+
 # Initialize the bot
-bot = FohlFehBot(BOT_TOKEN)
-bot.add_private_message_handler(on_private_message)
+bot = None if LAZY_STARTUP else build_bot()
 
 
 def lambda_handler(event, context):
+    logger.set_request_id(getattr(context, "aws_request_id", None))
     try:
+        # Queue-triggered invocations deliver a batch of updates as records
+        if "Records" in event:
+            bodies = [json.loads(record["body"]) for record in event["Records"]]
+            return handle_batch(bodies)
+
         # Parse the incoming update from Telegram
         body = json.loads(event.get("body", "{}"))
-        logger.info(f"Incoming request body: {body}")
+        logger.debug("Incoming request body: %s", body)
+
+        if isinstance(body, list):
+            return handle_batch(body)
+
+        from telegram_bot import accepts_update
+
+        # Skip the updates the bot does not answer before loading the bot
+        if "update_id" in body and not accepts_update(body):
+            logger.debug("Ignored update %s", body["update_id"])
+            return {"statusCode": 200, "body": "ignored"}
 
         # Create Update object from the incoming data
+        from telegram_bot import LambdaRequestParser
+
+        bot = get_bot()
         parser = LambdaRequestParser(bot.application)
-        update = parser.parse(body)
+        with metrics.span("lambda.parse"):
+            update = parser.parse(body)
 
         if not update:
             logger.error("Received invalid update")
             return {"statusCode": 400, "body": "Bad Request"}
 
-        # Handle the update asynchronously
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(bot.handle_update_async(update))
+        # Acknowledge right away and leave the processing to the worker
+        if update_queue is not None:
+            runner.run(update_queue.put(body))
+            return {"statusCode": 200, "body": "ok"}
+
+        # Handle the update on the long-lived event loop
+        with metrics.span("lambda.handle"):
+            runner.run(bot.handle_update_async(update))
+        # The reply is sent, finish summarizing long histories before freezing
+        runner.run(language_model.wait_background_tasks())
 
         # Return success response
         return {"statusCode": 200, "body": "ok"}
@@ -59,3 +222,51 @@ def lambda_handler(event, context):
     except Exception as e:
         logger.error(f"Unhandled error: {e}", exc_info=True)
         return {"statusCode": 500, "body": f"Error: {e}"}
+    finally:
+        metrics.flush()
+
+
+async def enqueue_updates(updates: list) -> None:
+    for update in updates:
+        await update_queue.put(update.to_dict())
+
+
+def handle_batch(bodies: list) -> dict:
+    """
+    Process many updates in one invocation, independent chats concurrently.
+    """
+    from telegram_bot import LambdaRequestParser
+
+    bot = get_bot()
+    updates = LambdaRequestParser(bot.application).parse_batch(bodies)
+    logger.info("Received batch of %d bodies, %d valid", len(bodies), len(updates))
+
+    if update_queue is not None:
+        runner.run(enqueue_updates(updates))
+    else:
+        runner.run(bot.handle_updates_async(updates))
+        runner.run(language_model.wait_background_tasks())
+    return {"statusCode": 200, "body": f"processed {len(updates)}"}
+
+
+def worker_handler(event, context):
+    """
+    Process the updates queued by `lambda_handler` in fast-ack mode.
+    """
+    logger.set_request_id(getattr(context, "aws_request_id", None))
+    try:
+        from telegram_bot import UpdateWorker
+
+        if update_queue is None:
+            return {"statusCode": 400, "body": "UPDATE_QUEUE_PATH is not set"}
+
+        worker = UpdateWorker(get_bot(), update_queue, WORKER_CONCURRENCY)
+        processed = runner.run(worker.drain())
+        runner.run(language_model.wait_background_tasks())
+        logger.info(f"Processed {processed} queued updates")
+        return {"statusCode": 200, "body": f"processed {processed}"}
+    except Exception as e:
+        logger.error(f"Unhandled error: {e}", exc_info=True)
+        return {"statusCode": 500, "body": f"Error: {e}"}
+    finally:
+        metrics.flush()
@@ -0,0 +1,45 @@
+"""
+Run the bot as a long-lived process that long-polls Telegram for updates,
+for deployments without a webhook:
+
+    BOT_TOKEN=... GPT_TOKEN=... python polling.py
+"""
+
+import os
+import signal
+import asyncio
+
+from lambda_function import get_bot, logger, runner
+
+# updates processed at once, and seconds each getUpdates request is held open
+POLL_CONCURRENCY = int(os.getenv("POLL_CONCURRENCY", "32"))
+POLL_TIMEOUT = int(os.getenv("POLL_TIMEOUT", "30"))
+# remove a webhook left over from a Lambda deployment, or polling is rejected
+DELETE_WEBHOOK = os.getenv("DELETE_WEBHOOK", "").lower() in ["1", "true", "yes"]
+
+
+async def poll() -> None:
+    from telegram_bot import LongPollingRunner
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    bot = get_bot()
+    if DELETE_WEBHOOK:
+        await bot.application.bot.delete_webhook()
+
+    await LongPollingRunner(bot, POLL_CONCURRENCY, POLL_TIMEOUT).run(stop)
+
+
+def main() -> None:
+    try:
+        runner.run(poll())
+    finally:
+        runner.close()
+        logger.info("Shut down")
+
+
+if __name__ == "__main__":
+    main()
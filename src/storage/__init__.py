@@ -0,0 +1,2 @@
+from .memory import InMemoryConversationStore, InMemoryUpdateQueue
+from .sqlite import SQLiteConversationStore, SQLiteUpdateQueue, SQLiteIdempotencyStore
@@ -0,0 +1,138 @@
+import json
+import asyncio
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+from core import ConversationStore, UpdateQueue, estimate_tokens, trim_start
+
+
+class _Conversation:
+    __slots__ = ("messages", "sizes", "tokens", "nbytes", "ntokens")
+
+    def __init__(self):
+        self.messages: List[Dict[str, Any]] = []
+        self.sizes: List[int] = []
+        self.tokens: List[int] = []
+        self.nbytes: int = 0
+        self.ntokens: int = 0
+
+
+class InMemoryConversationStore(ConversationStore):
+    """
+    Per-chat message histories kept in a bounded, LRU-evicted map.
+    """
+
+    MAX_CHATS = 10_000
+    MAX_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, max_chats: int = MAX_CHATS, max_bytes: int = MAX_BYTES):
+        self.max_chats = max_chats
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._chats: OrderedDict[Hashable, _Conversation] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._chats)
+
+    def __contains__(self, chat_id: Hashable) -> bool:
+        return chat_id in self._chats
+
+    def load(self, chat_id: Hashable) -> List[Dict[str, Any]]:
+        """
+        Return a copy of the chat history, marking the chat as recently used.
+        """
+        conversation = self._chats.get(chat_id)
+        if conversation is None:
+            return []
+        self._chats.move_to_end(chat_id)
+        return list(conversation.messages)
+
+    def append(self, chat_id: Hashable, messages: List[Dict[str, Any]]) -> None:
+        conversation = self._touch(chat_id)
+        for message in messages:
+            size = self._sizeof(message)
+            tokens = estimate_tokens(message)
+            conversation.messages.append(message)
+            conversation.sizes.append(size)
+            conversation.tokens.append(tokens)
+            conversation.nbytes += size
+            conversation.ntokens += tokens
+            self.total_bytes += size
+        self._evict()
+
+    def replace(self, chat_id: Hashable, messages: List[Dict[str, Any]]) -> None:
+        self.clear(chat_id)
+        self.append(chat_id, messages)
+
+    def clear(self, chat_id: Hashable) -> None:
+        conversation = self._chats.pop(chat_id, None)
+        if conversation is not None:
+            self.total_bytes -= conversation.nbytes
+
+    def token_count(self, chat_id: Hashable) -> int:
+        conversation = self._chats.get(chat_id)
+        return conversation.ntokens if conversation is not None else 0
+
+    def trim(self, chat_id: Hashable, max_tokens: int) -> int:
+        """
+        Drop the oldest messages until the history fits in `max_tokens`.
+        """
+        conversation = self._chats.get(chat_id)
+        if conversation is None or conversation.ntokens <= max_tokens:
+            return 0
+        roles = [message["role"] for message in conversation.messages]
+        start = trim_start(roles, conversation.tokens, max_tokens)
+        dropped_bytes = sum(conversation.sizes[:start])
+        conversation.nbytes -= dropped_bytes
+        conversation.ntokens -= sum(conversation.tokens[:start])
+        self.total_bytes -= dropped_bytes
+        del conversation.messages[:start]
+        del conversation.sizes[:start]
+        del conversation.tokens[:start]
+        return start
+
+    def _touch(self, chat_id: Hashable) -> _Conversation:
+        conversation = self._chats.get(chat_id)
+        if conversation is None:
+            conversation = self._chats[chat_id] = _Conversation()
+        else:
+            self._chats.move_to_end(chat_id)
+        return conversation
+
+    def _evict(self) -> None:
+        # evict least recently used chats, never the one that was just touched
+        while len(self._chats) > 1 and (
+            len(self._chats) > self.max_chats or self.total_bytes > self.max_bytes
+        ):
+            _, conversation = self._chats.popitem(last=False)
+            self.total_bytes -= conversation.nbytes
+
+    @staticmethod
+    def _sizeof(message: Dict[str, Any]) -> int:
+        return len(json.dumps(message, ensure_ascii=False, default=str).encode())
+
+
+class InMemoryUpdateQueue(UpdateQueue):
+    """
+    In-process update queue for runners whose workers share the event loop.
+    """
+
+    def __init__(self, maxsize: int = 0):
+        self._queue: asyncio.Queue[Dict[str, Any]] = asyncio.Queue(maxsize)
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    async def put(self, update: Dict[str, Any]) -> None:
+        await self._queue.put(update)
+
+    async def get(self, timeout: float = None) -> Optional[Dict[str, Any]]:
+        try:
+            if timeout is not None and timeout <= 0:
+                return self._queue.get_nowait()
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except (asyncio.QueueEmpty, asyncio.TimeoutError):
+            return None
+
+    async def ack(self, update: Dict[str, Any]) -> None:
+        self._queue.task_done()
@@ -0,0 +1,300 @@
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from core import ConversationStore, UpdateQueue, IdempotencyStore
+from core import estimate_tokens, trim_start
+
+
+class _SQLiteDatabase:
+    SCHEMA = ""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("PRAGMA busy_timeout=5000")
+        self._connection.executescript(self.SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    @contextmanager
+    def _transaction(self):
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._connection
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+
+class SQLiteConversationStore(_SQLiteDatabase, ConversationStore):
+    """
+    Conversation histories persisted in an append-only SQLite message table.
+
+    Appends are buffered and written in batches; clearing or replacing a
+    history only moves the chat's head pointer past its old messages, which
+    are reclaimed by `compact` every `COMPACT_INTERVAL` head moves.
+    """
+
+    BATCH_SIZE = 64
+    COMPACT_INTERVAL = 100
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id NOT NULL,
+            role TEXT NOT NULL,
+            tokens INTEGER NOT NULL,
+            payload TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS messages_by_chat ON messages (chat_id, id);
+        CREATE TABLE IF NOT EXISTS chats (
+            chat_id PRIMARY KEY,
+            head INTEGER NOT NULL
+        );
+    """
+
+    # filters the messages of one chat that are at or after its head
+    _VISIBLE = """
+        WHERE chat_id = ?
+          AND id >= COALESCE((SELECT head FROM chats WHERE chat_id = ?), 0)
+    """
+
+    def __init__(self, path: str, batch_size: int = BATCH_SIZE):
+        super().__init__(path)
+        self.batch_size = batch_size
+        self._pending: List[Tuple[Hashable, str, int, str]] = []
+        self._head_moves = 0
+
+    def load(self, chat_id: Hashable) -> List[Dict[str, Any]]:
+        with self._lock:
+            self.flush()
+            rows = self._connection.execute(
+                f"SELECT payload FROM messages {self._VISIBLE} ORDER BY id",
+                (chat_id, chat_id),
+            ).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def append(self, chat_id: Hashable, messages: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._pending.extend(
+                (
+                    chat_id,
+                    message["role"],
+                    estimate_tokens(message),
+                    json.dumps(message, ensure_ascii=False, default=str),
+                )
+                for message in messages
+            )
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def replace(self, chat_id: Hashable, messages: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self.clear(chat_id)
+            self.append(chat_id, messages)
+
+    def clear(self, chat_id: Hashable) -> None:
+        with self._lock:
+            self.flush()
+            # every message written from now on has a larger id than the head
+            (head,) = self._connection.execute("""
+                SELECT COALESCE(MAX(seq), 0) + 1 FROM sqlite_sequence
+                WHERE name = 'messages'
+                """).fetchone()
+            self._set_head(chat_id, head)
+
+    def token_count(self, chat_id: Hashable) -> int:
+        with self._lock:
+            self.flush()
+            (total,) = self._connection.execute(
+                f"SELECT COALESCE(SUM(tokens), 0) FROM messages {self._VISIBLE}",
+                (chat_id, chat_id),
+            ).fetchone()
+        return total
+
+    def trim(self, chat_id: Hashable, max_tokens: int) -> int:
+        """
+        Move the chat head past the oldest messages until the history fits.
+        """
+        with self._lock:
+            self.flush()
+            rows = self._connection.execute(
+                f"SELECT id, role, tokens FROM messages {self._VISIBLE} ORDER BY id",
+                (chat_id, chat_id),
+            ).fetchall()
+            if sum(tokens for _, _, tokens in rows) <= max_tokens:
+                return 0
+            start = trim_start(
+                [role for _, role, _ in rows],
+                [tokens for _, _, tokens in rows],
+                max_tokens,
+            )
+            self._set_head(chat_id, rows[start][0])
+        return start
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            with self._transaction():
+                self._connection.executemany(
+                    """
+                    INSERT INTO messages (chat_id, role, tokens, payload)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    pending,
+                )
+
+    def compact(self) -> int:
+        """
+        Delete messages that are no longer visible in any chat history.
+        """
+        with self._lock, self._transaction():
+            cursor = self._connection.execute("""
+                DELETE FROM messages
+                WHERE id < (SELECT head FROM chats WHERE chats.chat_id = messages.chat_id)
+                """)
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            super().close()
+
+    def _set_head(self, chat_id: Hashable, head: int) -> None:
+        self._connection.execute(
+            """
+            INSERT INTO chats (chat_id, head) VALUES (?, ?)
+            ON CONFLICT (chat_id) DO UPDATE SET head = excluded.head
+            """,
+            (chat_id, head),
+        )
+        self._head_moves += 1
+        if self._head_moves % self.COMPACT_INTERVAL == 0:
+            self.compact()
+
+
+class SQLiteUpdateQueue(_SQLiteDatabase, UpdateQueue):
+    """
+    Update queue in a local SQLite file, standing in for a managed queue.
+
+    Updates are keyed by `update_id`, so redelivered webhooks are enqueued
+    once. A claimed update becomes visible again if it is not acknowledged
+    within `visibility_timeout` seconds.
+    """
+
+    POLL_INTERVAL = 0.05
+    VISIBILITY_TIMEOUT = 300.0
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS updates (
+            update_id INTEGER PRIMARY KEY,
+            payload TEXT NOT NULL,
+            claimed_at REAL
+        );
+    """
+
+    def __init__(self, path: str, visibility_timeout: float = VISIBILITY_TIMEOUT):
+        super().__init__(path)
+        self.visibility_timeout = visibility_timeout
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._connection.execute(
+                "SELECT COUNT(*) FROM updates"
+            ).fetchone()
+        return count
+
+    async def put(self, update: Dict[str, Any]) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO updates (update_id, payload) VALUES (?, ?)",
+                (update["update_id"], json.dumps(update)),
+            )
+
+    async def get(self, timeout: float = None) -> Optional[Dict[str, Any]]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            update = self._claim()
+            if update is not None:
+                return update
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(self.POLL_INTERVAL)
+
+    async def ack(self, update: Dict[str, Any]) -> None:
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM updates WHERE update_id = ?", (update["update_id"],)
+            )
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock, self._transaction():
+            row = self._connection.execute(
+                """
+                SELECT update_id, payload FROM updates
+                WHERE claimed_at IS NULL OR claimed_at < ?
+                ORDER BY update_id LIMIT 1
+                """,
+                (now - self.visibility_timeout,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE updates SET claimed_at = ? WHERE update_id = ?", (now, row[0])
+            )
+        return json.loads(row[1])
+
+
+class SQLiteIdempotencyStore(_SQLiteDatabase, IdempotencyStore):
+    """
+    Keys seen recently, shared by every process using the same file.
+    """
+
+    # number of additions between two purges of expired keys
+    PURGE_INTERVAL = 1000
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS seen (
+            key PRIMARY KEY,
+            expires_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._additions = 0
+
+    def add(self, key: Hashable, ttl: float) -> bool:
+        now = time.time()
+        with self._lock, self._transaction():
+            row = self._connection.execute(
+                "SELECT expires_at FROM seen WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[0] > now:
+                return False
+            self._connection.execute(
+                "INSERT OR REPLACE INTO seen (key, expires_at) VALUES (?, ?)",
+                (key, now + ttl),
+            )
+            self._additions += 1
+            if self._additions % self.PURGE_INTERVAL == 0:
+                self._connection.execute(
+                    "DELETE FROM seen WHERE expires_at <= ?", (now,)
+                )
+        return True
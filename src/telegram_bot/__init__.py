@@ -1,3 +1,37 @@
-from .poco import TelegramMessage
-from .fohlfeh import FohlFehBot
-from .parsers import LambdaRequestParser
+import importlib
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .poco import TelegramMessage
+    from .prefilter import accepts_update
+    from .fohlfeh import FohlFehBot
+    from .parsers import LambdaRequestParser
+    from .worker import UpdateWorker
+    from .dedup import UpdateDeduplicator
+    from .scheduler import ChatScheduler
+    from .polling import LongPollingRunner
+    from .sender import OutboundSender
+
+# submodules are imported on first use, so filtering raw updates does not
+# load python-telegram-bot
+_EXPORTS = {
+    "TelegramMessage": "poco",
+    "accepts_update": "prefilter",
+    "FohlFehBot": "fohlfeh",
+    "LambdaRequestParser": "parsers",
+    "UpdateWorker": "worker",
+    "UpdateDeduplicator": "dedup",
+    "ChatScheduler": "scheduler",
+    "LongPollingRunner": "polling",
+    "OutboundSender": "sender",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f".{module}", __name__), name)
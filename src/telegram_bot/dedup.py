@@ -0,0 +1,41 @@
+import logging
+
+from core import IdempotencyStore
+from utils import TTLCache
+
+
+class UpdateDeduplicator:
+    """
+    Recognizes Telegram updates that were already delivered within a window.
+
+    Update ids are checked against a bounded in-memory seen-set first and
+    then, if configured, against a store shared with other processes.
+    """
+
+    # Telegram keeps retrying an unacknowledged webhook for a while
+    WINDOW = 3600.0
+    MAX_SIZE = 100_000
+
+    def __init__(
+        self,
+        store: IdempotencyStore = None,
+        window: float = WINDOW,
+        max_size: int = MAX_SIZE,
+    ):
+        self.store = store
+        self.window = window
+        self.seen = TTLCache(max_size)
+        self.duplicates = 0
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def is_duplicate(self, update_id: int) -> bool:
+        """
+        Record the update and return True if it has been seen before.
+        """
+        if self.seen.get(update_id) is TTLCache.MISSING:
+            self.seen.set(update_id, True, self.window)
+            if self.store is None or self.store.add(update_id, self.window):
+                return False
+        self.duplicates += 1
+        self.logger.info("Skipping duplicate update %s", update_id)
+        return True
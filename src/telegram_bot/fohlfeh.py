@@ -1,19 +1,61 @@
+import time
+import httpx
+import asyncio
 import logging
 
-from typing import Callable, Awaitable
-from telegram import Update
+from typing import Any, AsyncIterator, Callable, Awaitable
+from telegram import Bot, Update, User
+from telegram.request import HTTPXRequest
 from telegram.ext import ApplicationBuilder, MessageHandler, filters, ContextTypes
+from utils import metrics
 
 from .poco import TelegramMessage
+from .dedup import UpdateDeduplicator
+from .scheduler import ChatScheduler
+from .sender import OutboundSender
 
 
 class FohlFehBot:
-    def __init__(self, bot_token: str):
+    # text shown while a streamed reply has not produced any content yet
+    PLACEHOLDER_TEXT = "..."
+    # minimum seconds between two edits of a streamed reply
+    EDIT_INTERVAL = 1.0
+    # seconds idle connections to the Bot API stay open between requests
+    KEEPALIVE_EXPIRY = 120
+    CONNECTION_POOL_SIZE = 64
+    # private attributes of `telegram.Bot` used to skip `getMe`, as found in
+    # python-telegram-bot 22.8; without them the bot initializes as usual
+    BOT_INTERNALS = (
+        "_bot_user",
+        "_bot_initialized",
+        "_request",
+        "_requests_initialized",
+    )
+
+    def __init__(
+        self,
+        bot_token: str,
+        bot_username: str = None,
+        deduplicator: UpdateDeduplicator = None,
+        scheduler: ChatScheduler = None,
+        base_url: str = None,
+        sender: OutboundSender = None,
+    ):
         self.application_initialized = False
-        self.application = ApplicationBuilder().token(bot_token).build()
+        self._initialize_lock = asyncio.Lock()
+        self.deduplicator = deduplicator
+        self.scheduler = scheduler if scheduler is not None else ChatScheduler()
+        self.sender = sender if sender is not None else OutboundSender()
+        builder = ApplicationBuilder().token(bot_token).request(self._build_request())
+        # a local Bot API server, addressed as f"{base_url}{bot_token}/{method}"
+        if base_url:
+            builder = builder.base_url(base_url)
+        self.application = builder.build()
         self.logger = logging.getLogger(self.__class__.__name__)
+        if bot_username:
+            self._set_bot_identity(bot_token, bot_username)
         # register handlers
-        self.handlers: dict[str, Callable[[TelegramMessage], Awaitable[str]]] = {}
+        self.handlers: dict[str, Callable[[TelegramMessage], Any]] = {}
         self._add_handlers()
 
     def add_private_message_handler(
@@ -22,20 +64,109 @@ class FohlFehBot:
         self.handlers["private_message"] = delegate_function
         self.logger.info("Added private message handler")
 
+    def add_private_message_stream_handler(
+        self, delegate_function: Callable[[TelegramMessage], AsyncIterator[str]]
+    ):
+        """
+        Reply to private messages by progressively editing a placeholder message
+        with the text chunks yielded by the handler.
+        """
+        self.handlers["private_message_stream"] = delegate_function
+        self.logger.info("Added private message stream handler")
+
+    async def shutdown(self) -> None:
+        if self.application_initialized:
+            await self.application.shutdown()
+            self.application_initialized = False
+
     async def handle_update_async(self, update: Update) -> None:
         """
         Process an update asynchronously.
         """
         try:
+            # skip redelivered updates before doing any work for them
+            if self.deduplicator is not None and self.deduplicator.is_duplicate(
+                update.update_id
+            ):
+                metrics.count("telegram.duplicates")
+                return
+
+            with metrics.span("telegram.initialize"):
+                await self.initialize()
+
+            self.logger.debug("Received update: %s", update)
+            with metrics.span("telegram.process_update"):
+                await self.application.process_update(update)
+        except Exception as e:
+            self.logger.error(f"Error in handle_update_async: {e}", exc_info=True)
+
+    async def handle_updates_async(self, updates: list[Update]) -> None:
+        """
+        Process a batch of updates, chats concurrently and each chat in order.
+        """
+        chats: dict[int, list[Update]] = {}
+        for update in updates:
+            chat = update.effective_chat
+            chats.setdefault(chat.id if chat else None, []).append(update)
+        self.logger.info(
+            "Processing %d updates from %d chats", len(updates), len(chats)
+        )
+        await self.initialize()
+        await asyncio.gather(
+            *(self._handle_chat_updates(chat) for chat in chats.values())
+        )
+
+    async def initialize(self) -> None:
+        # concurrent updates must not initialize the application twice
+        async with self._initialize_lock:
             if not self.application_initialized:
+                bot = self.application.bot
+                if (
+                    self._has_bot_internals(bot)
+                    and bot._bot_initialized
+                    and not bot._requests_initialized
+                ):
+                    # the bot user is known, only its HTTP clients need to start,
+                    # otherwise initializing the bot still calls `getMe`
+                    await asyncio.gather(*(r.initialize() for r in bot._request))
+                    bot._requests_initialized = True
                 await self.application.initialize()
                 self.application_initialized = True
                 self.logger.info("Application initialized")
 
-            self.logger.debug(f"Received update: {update}")
-            await self.application.process_update(update)
-        except Exception as e:
-            self.logger.error(f"Error in handle_update_async: {e}", exc_info=True)
+    async def _handle_chat_updates(self, updates: list[Update]) -> None:
+        for update in updates:
+            await self.handle_update_async(update)
+
+    def _build_request(self) -> HTTPXRequest:
+        return HTTPXRequest(
+            connection_pool_size=self.CONNECTION_POOL_SIZE,
+            httpx_kwargs={
+                "limits": httpx.Limits(
+                    max_connections=self.CONNECTION_POOL_SIZE,
+                    keepalive_expiry=self.KEEPALIVE_EXPIRY,
+                )
+            },
+        )
+
+    def _set_bot_identity(self, bot_token: str, bot_username: str) -> None:
+        """
+        Provide the bot user up front so initializing the application does
+        not need a `getMe` round-trip to Telegram.
+        """
+        bot = self.application.bot
+        if not self._has_bot_internals(bot):
+            self.logger.warning("Cannot preset the bot identity, calling getMe")
+            return
+        # the numeric prefix of a bot token is the bot's user id
+        bot_id = int(bot_token.split(":", 1)[0])
+        bot._bot_user = User(
+            id=bot_id, first_name=bot_username, is_bot=True, username=bot_username
+        )
+        bot._bot_initialized = True
+
+    def _has_bot_internals(self, bot: Bot) -> bool:
+        return all(hasattr(bot, name) for name in self.BOT_INTERNALS)
 
     def _add_handlers(self):
         self.application.add_handler(
@@ -49,19 +180,79 @@ class FohlFehBot:
         Echo the user message.
         """
         try:
+            stream_handler = self.handlers.get("private_message_stream", None)
             async_handler = self.handlers.get("private_message", None)
 
             # check if there's a handler for private messages
-            if async_handler is None:
+            if stream_handler is None and async_handler is None:
                 return
 
-            message = TelegramMessage(update)
+            message = TelegramMessage.from_update(update)
             if message.is_private_chat:
-                self.logger.debug(f"Received message: {message}")
-                replay_message = await async_handler(message)
-                self.logger.debug(f"Received replay: {replay_message}")
-                await update.message.reply_text(replay_message)
+                self.logger.debug("Received message: %s", message)
+                # one turn at a time per chat, bursts are answered together
+                await self.scheduler.run(message.chatid, (update, message), self._reply)
         except Exception as e:
             self.logger.error(
                 f"Error in _on_private_message handler: {e}", exc_info=True
             )
+
+    async def _reply(self, batch: list[tuple[Update, TelegramMessage]]) -> None:
+        update, message = batch[-1]
+        if len(batch) > 1:
+            message.text = "\n".join(queued.text for _, queued in batch)
+            self.logger.debug("Coalesced %d messages: %s", len(batch), message)
+
+        async with self.sender.typing(update.effective_chat):
+            await self._reply_message(update, message)
+
+    async def _reply_message(self, update: Update, message: TelegramMessage) -> None:
+        stream_handler = self.handlers.get("private_message_stream", None)
+        if stream_handler is not None:
+            with metrics.span("telegram.stream_reply"):
+                await self._reply_streaming(update, stream_handler(message))
+            return
+        with metrics.span("telegram.handler"):
+            replay_message = await self.handlers["private_message"](message)
+        self.logger.debug("Received replay: %s", replay_message)
+        # handlers return nothing when they failed, there is nothing to send
+        if not replay_message:
+            self.logger.warning("No reply for message: %s", message)
+            return
+        with metrics.span("telegram.reply"):
+            await self.sender.reply(update.message, replay_message)
+
+    async def _reply_streaming(
+        self, update: Update, chunks: AsyncIterator[str]
+    ) -> None:
+        """
+        Send a placeholder right away and edit it with coalesced chunks.
+        """
+        reply = (await self.sender.reply(update.message, self.PLACEHOLDER_TEXT))[0]
+        parts: list[str] = []
+        sent_text = ""
+        last_edit = 0.0
+
+        async for chunk in chunks:
+            parts.append(chunk)
+            now = time.monotonic()
+            if now - last_edit < self.EDIT_INTERVAL:
+                continue
+            # the start of a reply too long for one message is shown until done
+            text = "".join(parts)[: self.sender.MAX_MESSAGE_LENGTH]
+            if text.strip() and text != sent_text:
+                await self.sender.edit(reply, text)
+                sent_text = text
+                last_edit = now
+
+        text = "".join(parts)
+        chunks = self.sender.split(text)
+        if not chunks:
+            await reply.delete()
+            return
+        if chunks[0] != sent_text:
+            await self.sender.edit(reply, chunks[0])
+        # the rest of a long reply follows in new messages
+        for chunk in chunks[1:]:
+            await self.sender.reply(update.message, chunk)
+        self.logger.debug("Streamed replay: %s", text)
@@ -1,10 +1,16 @@
+import logging
+
+from typing import List
 from telegram import Update
 from telegram.ext import Application
 
+from .prefilter import accepts_update
+
 
 class LambdaRequestParser:
     def __init__(self, application: Application):
         self.application = application
+        self.logger = logging.getLogger(self.__class__.__name__)
 
     def parse(self, body: dict) -> Update:
         """
@@ -14,3 +20,21 @@ class LambdaRequestParser:
         if "update_id" in body:
             update = Update.de_json(body, self.application.bot)
         return update
+
+    def parse_batch(self, bodies: List[dict]) -> List[Update]:
+        """
+        Get the Telegram Update objects the bot answers from a batch, in update
+        order.
+        """
+        updates = []
+        for body in bodies:
+            if not accepts_update(body):
+                continue
+            # one malformed body must not fail, and redeliver, the whole batch
+            try:
+                updates.append(self.parse(body))
+            except Exception as e:
+                self.logger.error(
+                    "Dropped malformed update %s: %r", body["update_id"], e
+                )
+        return sorted(updates, key=lambda update: update.update_id)
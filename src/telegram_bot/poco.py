@@ -1,42 +1,74 @@
-from telegram import Update
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from telegram import Update
 
 
 class TelegramMessage:
-    def __init__(self, update: Update):
-        self._update: Update = update
-        self.userid: int = None
-        self.username: str = None
-        self.user_fullname: str = None
-        self.text: str = None
-        self.chatid: int = None
-        self.chat_type: str = None
-        self.is_group_chat: bool = False
-        self.is_private_chat: bool = False
-
-        # parse user information
-        if update.effective_user:
-            self.userid = update.effective_user.id
-            self.username = update.effective_user.username
-            self.user_fullname = (
-                f"{update.effective_user.first_name} {update.effective_user.last_name}"
-            )
-
-        # parse message information
-        if update.message and update.message.text:
-            self.text = update.message.text
-
-        # parse chat information
-        if update.effective_chat:
-            self.chatid = update.effective_chat.id
-            self.chat_type = update.effective_chat.type
-            self.is_group_chat = (
-                True if self.chat_type in ["group", "supergroup"] else False
-            )
-            self.is_private_chat = (
-                True
-                if self.chat_type not in ["group", "supergroup", "channel"]
-                else False
-            )
+    """
+    The fields of an incoming text message the bot works with.
+    """
+
+    __slots__ = ("userid", "username", "user_fullname", "text", "chatid", "chat_type")
+
+    GROUP_CHAT_TYPES = frozenset({"group", "supergroup"})
+    NON_PRIVATE_CHAT_TYPES = frozenset({"group", "supergroup", "channel"})
+
+    def __init__(
+        self,
+        chatid: int = None,
+        chat_type: str = None,
+        text: str = None,
+        userid: int = None,
+        username: str = None,
+        user_fullname: str = None,
+    ):
+        self.chatid = chatid
+        self.chat_type = chat_type
+        self.text = text
+        self.userid = userid
+        self.username = username
+        self.user_fullname = user_fullname
+
+    @classmethod
+    def from_update(cls, update: "Update") -> "TelegramMessage":
+        chat = update.effective_chat
+        user = update.effective_user
+        return cls(
+            chatid=chat.id if chat else None,
+            chat_type=chat.type if chat else None,
+            text=update.message.text if update.message else None,
+            userid=user.id if user else None,
+            username=user.username if user else None,
+            user_fullname=(
+                cls._full_name(user.first_name, user.last_name) if user else None
+            ),
+        )
+
+    @property
+    def is_group_chat(self) -> bool:
+        return self.chat_type in self.GROUP_CHAT_TYPES
+
+    @property
+    def is_private_chat(self) -> bool:
+        return self.chat_type not in self.NON_PRIVATE_CHAT_TYPES
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TelegramMessage):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(chatid={self.chatid!r}, "
+            f"chat_type={self.chat_type!r}, userid={self.userid!r}, text={self.text!r})"
+        )
 
     def __str__(self):
-        return f"User: {self._update.effective_user}, Chat: {self._update.effective_chat}, Message: {self.text}"
+        return f"User: {self.userid} ({self.username}), Chat: {self.chatid}, Message: {self.text}"
+
+    @staticmethod
+    def _full_name(first_name: str, last_name: str) -> str:
+        return f"{first_name} {last_name}" if last_name else first_name
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+
+from telegram import Update
+from telegram.error import Conflict, NetworkError, RetryAfter
+
+from .fohlfeh import FohlFehBot
+from .sender import retry_after_seconds
+
+
+class LongPollingRunner:
+    """
+    Feeds updates from `getUpdates` long polling to the bot, for deployments
+    that run as a long-lived process instead of behind a webhook.
+    """
+
+    # seconds Telegram holds a getUpdates request open waiting for updates
+    POLL_TIMEOUT = 30
+    # updates processed at the same time
+    CONCURRENCY = 32
+    # seconds to wait before polling again after a network error
+    ERROR_BACKOFF = 3.0
+    ALLOWED_UPDATES = ("message",)
+
+    def __init__(
+        self,
+        bot: FohlFehBot,
+        concurrency: int = CONCURRENCY,
+        poll_timeout: int = POLL_TIMEOUT,
+        allowed_updates: tuple[str, ...] = ALLOWED_UPDATES,
+    ):
+        self.bot = bot
+        self.concurrency = concurrency
+        self.poll_timeout = poll_timeout
+        self.allowed_updates = list(allowed_updates)
+        self.offset: int = None
+        self.processed = 0
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """
+        Poll and process updates until `stop` is set, then finish the
+        updates in flight and confirm them to Telegram.
+        """
+        await self.bot.initialize()
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks: set[asyncio.Task] = set()
+        self.logger.info("Long polling started")
+
+        while not stop.is_set():
+            updates = await self._poll(stop)
+            for update in updates:
+                self.offset = update.update_id + 1
+                # stop fetching while all workers are busy
+                await slots.acquire()
+                task = asyncio.create_task(self._handle(update, slots))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+        self.logger.info(f"Stopping, waiting for {len(tasks)} updates in flight")
+        await asyncio.gather(*tasks)
+        await self._confirm()
+        self.logger.info("Long polling stopped")
+
+    async def _poll(self, stop: asyncio.Event) -> tuple[Update, ...]:
+        poll = asyncio.create_task(
+            self.bot.application.bot.get_updates(
+                offset=self.offset,
+                timeout=self.poll_timeout,
+                allowed_updates=self.allowed_updates,
+            )
+        )
+        stopped = asyncio.create_task(stop.wait())
+        try:
+            await asyncio.wait([poll, stopped], return_when=asyncio.FIRST_COMPLETED)
+            if not poll.done():
+                return ()
+            return poll.result()
+        except RetryAfter as e:
+            delay = retry_after_seconds(e)
+            self.logger.warning(f"Rate limited by Telegram, retrying in {delay}s")
+            await self._sleep(stop, delay)
+        except Conflict as e:
+            # another poller is running, or a webhook is still set
+            self.logger.error(f"Polling rejected by Telegram: {e}")
+            await self._sleep(stop, self.ERROR_BACKOFF)
+        except NetworkError as e:
+            self.logger.warning(f"Polling failed: {e}")
+            await self._sleep(stop, self.ERROR_BACKOFF)
+        finally:
+            poll.cancel()
+            stopped.cancel()
+        return ()
+
+    async def _handle(self, update: Update, slots: asyncio.Semaphore) -> None:
+        try:
+            await self.bot.handle_update_async(update)
+            self.processed += 1
+        finally:
+            slots.release()
+
+    async def _confirm(self) -> None:
+        # requesting past the last offset marks earlier updates as delivered
+        if self.offset is None:
+            return
+        try:
+            await self.bot.application.bot.get_updates(offset=self.offset, timeout=0)
+        except NetworkError as e:
+            self.logger.warning(f"Could not confirm processed updates: {e}")
+
+    @staticmethod
+    async def _sleep(stop: asyncio.Event, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(stop.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
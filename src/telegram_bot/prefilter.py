@@ -0,0 +1,22 @@
+from typing import Any
+
+
+def accepts_update(body: Any) -> bool:
+    """
+    Check on the raw update whether the bot answers it: a new text message,
+    not a command, in a private chat. Edited messages, channel posts, group
+    chats and other updates are dropped before any object is built.
+
+    Kept free of python-telegram-bot imports, so ignored updates do not pay
+    for loading it.
+    """
+    if not isinstance(body, dict) or not isinstance(body.get("update_id"), int):
+        return False
+    message = body.get("message")
+    if not isinstance(message, dict):
+        return False
+    chat = message.get("chat")
+    if not isinstance(chat, dict) or chat.get("type") != "private":
+        return False
+    text = message.get("text")
+    return isinstance(text, str) and not text.startswith("/")
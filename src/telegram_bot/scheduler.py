@@ -0,0 +1,79 @@
+import asyncio
+
+from typing import Awaitable, Callable, Dict, Generic, Hashable, List, TypeVar
+
+_Item = TypeVar("_Item")
+
+
+class _ChatSlot(Generic[_Item]):
+    __slots__ = ("lock", "pending", "submitted", "consumed", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending: List[_Item] = []
+        self.submitted = 0
+        self.consumed = 0
+        self.users = 0
+
+
+class ChatScheduler(Generic[_Item]):
+    """
+    Serializes work per chat and bounds how many chats are processed at once.
+
+    Items submitted for a chat while an earlier batch of that chat is being
+    processed are coalesced and handed to the next call as one batch.
+    """
+
+    MAX_CONCURRENCY = 16
+    # seconds the first item of a batch waits for more items to arrive
+    COALESCE_WINDOW = 0.0
+
+    def __init__(
+        self,
+        max_concurrency: int = MAX_CONCURRENCY,
+        coalesce_window: float = COALESCE_WINDOW,
+    ):
+        self.max_concurrency = max_concurrency
+        self.coalesce_window = coalesce_window
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._slots: Dict[Hashable, _ChatSlot[_Item]] = {}
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    async def run(
+        self,
+        chat_id: Hashable,
+        item: _Item,
+        process: Callable[[List[_Item]], Awaitable[None]],
+    ) -> bool:
+        """
+        Process `item` with everything else pending for the chat.
+
+        Returns False if the item was coalesced into a batch another caller
+        processed.
+        """
+        slot = self._slots.get(chat_id)
+        if slot is None:
+            slot = self._slots[chat_id] = _ChatSlot()
+        slot.pending.append(item)
+        slot.submitted += 1
+        sequence = slot.submitted
+        slot.users += 1
+
+        try:
+            async with slot.lock:
+                if sequence <= slot.consumed:
+                    return False
+                if self.coalesce_window > 0:
+                    await asyncio.sleep(self.coalesce_window)
+                batch, slot.pending = slot.pending, []
+                slot.consumed = slot.submitted
+                async with self._semaphore:
+                    await process(batch)
+                return True
+        finally:
+            # drop the slot once nobody is waiting on the chat anymore
+            slot.users -= 1
+            if slot.users == 0:
+                del self._slots[chat_id]
@@ -0,0 +1,151 @@
+import time
+import asyncio
+import logging
+
+from collections import OrderedDict
+from contextlib import asynccontextmanager, suppress
+from typing import AsyncIterator, Awaitable, Callable, Hashable, List, TypeVar
+from telegram import Chat, Message
+from telegram.constants import ChatAction, MessageLimit
+from telegram.error import RetryAfter
+from utils import TokenBucket, metrics
+
+_Result = TypeVar("_Result")
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    """
+    Seconds Telegram asks to wait before retrying.
+    """
+    # newer releases report a timedelta instead of seconds
+    retry_after = error.retry_after
+    return getattr(retry_after, "total_seconds", lambda: retry_after)()
+
+
+class OutboundSender:
+    """
+    Sends messages within Telegram's send limits: about one message per second
+    in a chat, with short bursts, and 30 per second overall.
+
+    Replies longer than a Telegram message are split, and requests rejected
+    with 429 are retried after the `retry_after` Telegram asks for.
+    """
+
+    MAX_MESSAGE_LENGTH = MessageLimit.MAX_TEXT_LENGTH
+    CHAT_RATE = 1.0
+    CHAT_BURST = 3
+    GLOBAL_RATE = 30.0
+    MAX_RETRIES = 3
+    # seconds between typing actions, clients show one for about 5 seconds
+    TYPING_INTERVAL = 4.5
+    # chats whose send rate is tracked, the least recent ones start over
+    MAX_CHATS = 10000
+
+    def __init__(
+        self,
+        chat_rate: float = CHAT_RATE,
+        chat_burst: int = CHAT_BURST,
+        global_rate: float = GLOBAL_RATE,
+        max_retries: int = MAX_RETRIES,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.clock = clock
+        self.sleep = sleep
+        self.global_bucket = TokenBucket(global_rate, global_rate, clock, sleep)
+        self._chat_buckets: OrderedDict[Hashable, TokenBucket] = OrderedDict()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def reply(self, message: Message, text: str) -> List[Message]:
+        """
+        Reply to `message`, in as many messages as `text` needs.
+        """
+        return [
+            await self.call(message.chat_id, lambda: message.reply_text(chunk))
+            for chunk in self.split(text)
+        ]
+
+    async def edit(self, message: Message, text: str) -> Message:
+        return await self.call(message.chat_id, lambda: message.edit_text(text))
+
+    async def call(
+        self, chat_id: Hashable, request: Callable[[], Awaitable[_Result]]
+    ) -> _Result:
+        """
+        Make a send request for `chat_id` once both rate limits allow it.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self._chat_bucket(chat_id).acquire()
+            await self.global_bucket.acquire()
+            try:
+                return await request()
+            except RetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = retry_after_seconds(e)
+                metrics.count("telegram.retry_after")
+                self.logger.warning(
+                    "Rate limited by Telegram in chat %s, retrying in %ss",
+                    chat_id,
+                    delay,
+                )
+                await self.sleep(delay)
+
+    @asynccontextmanager
+    async def typing(self, chat: Chat) -> AsyncIterator[None]:
+        """
+        Show the chat as typing until the block exits.
+        """
+        task = asyncio.create_task(self._keep_typing(chat))
+        try:
+            yield
+        finally:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+    @classmethod
+    def split(cls, text: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+        """
+        Split `text` into messages of at most `limit` characters, preferably
+        between paragraphs, lines or words.
+        """
+        chunks = []
+        while len(text) > limit:
+            for separator in ("\n\n", "\n", " "):
+                # the separator itself is dropped, it does not need to fit
+                cut = text.rfind(separator, 0, limit + len(separator))
+                if cut > 0:
+                    chunks.append(text[:cut])
+                    text = text[cut + len(separator) :]
+                    break
+            else:
+                chunks.append(text[:limit])
+                text = text[limit:]
+        chunks.append(text)
+        return [chunk for chunk in chunks if chunk.strip()]
+
+    async def _keep_typing(self, chat: Chat) -> None:
+        while True:
+            try:
+                await chat.send_action(ChatAction.TYPING)
+            except Exception as e:
+                # only a hint to the user, the reply does not depend on it
+                self.logger.debug("Could not send typing action: %s", e)
+            await asyncio.sleep(self.TYPING_INTERVAL)
+
+    def _chat_bucket(self, chat_id: Hashable) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(
+                self.chat_rate, self.chat_burst, self.clock, self.sleep
+            )
+            self._chat_buckets[chat_id] = bucket
+            if len(self._chat_buckets) > self.MAX_CHATS:
+                self._chat_buckets.popitem(last=False)
+        else:
+            self._chat_buckets.move_to_end(chat_id)
+        return bucket
@@ -0,0 +1,63 @@
+import asyncio
+import logging
+
+from core import UpdateQueue
+
+from .fohlfeh import FohlFehBot
+from .parsers import LambdaRequestParser
+
+
+class UpdateWorker:
+    """
+    Drains queued Telegram updates through the bot with bounded concurrency.
+    """
+
+    CONCURRENCY = 8
+    # seconds a worker waits for a new update before checking whether to stop
+    POLL_TIMEOUT = 1.0
+
+    def __init__(
+        self,
+        bot: FohlFehBot,
+        queue: UpdateQueue,
+        concurrency: int = CONCURRENCY,
+        poll_timeout: float = POLL_TIMEOUT,
+    ):
+        self.bot = bot
+        self.queue = queue
+        self.concurrency = concurrency
+        self.poll_timeout = poll_timeout
+        self.parser = LambdaRequestParser(bot.application)
+        self.processed = 0
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def drain(self) -> int:
+        """
+        Process queued updates until the queue is empty.
+        """
+        processed = self.processed
+        await asyncio.gather(*(self._work(None) for _ in range(self.concurrency)))
+        return self.processed - processed
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """
+        Process updates as they arrive until `stop` is set.
+        """
+        await asyncio.gather(*(self._work(stop) for _ in range(self.concurrency)))
+
+    async def _work(self, stop: asyncio.Event) -> None:
+        while stop is None or not stop.is_set():
+            body = await self.queue.get(self.poll_timeout if stop else 0)
+            if body is None:
+                if stop is None:
+                    return
+                continue
+            try:
+                update = self.parser.parse(body)
+                if update is not None:
+                    await self.bot.handle_update_async(update)
+            except Exception as e:
+                self.logger.error(f"Error processing queued update: {e}", exc_info=True)
+            finally:
+                await self.queue.ack(body)
+                self.processed += 1
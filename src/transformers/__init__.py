@@ -1 +1,3 @@
 from .gpt import OpenAIChatBot
+from .resilience import RequestGuard, UpstreamUnavailableError, CircuitOpenError
+from .routing import ModelRouter, RoutingRule
@@ -1,9 +1,76 @@
 import json
+import time
+import hashlib
+import asyncio
 import logging
 
-from typing import List
-from openai import AsyncOpenAI
-from core import ExternalToolsHandler
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Hashable, List
+from typing import Optional, Tuple, Type
+from core import ExternalToolsHandler, ConversationStore, ToolRegistry, function_tool
+from core import estimate_tokens, trim_start
+from storage import InMemoryConversationStore
+from utils import ResponseCache, metrics
+from .resilience import RequestGuard, UpstreamUnavailableError, CircuitOpenError
+from .routing import ModelRouter
+
+if TYPE_CHECKING:
+    # openai is slow to import, so it is only loaded when the client is first used
+    from openai import AsyncOpenAI
+    from openai.types.chat import ChatCompletionMessage
+
+# chat whose turn is being generated, visible to the tools it calls
+current_chat_id: ContextVar[Hashable] = ContextVar("current_chat_id")
+
+
+class HistoryTools(ExternalToolsHandler):
+    def __init__(self, bot: "OpenAIChatBot"):
+        super().__init__()
+        self.bot = bot
+
+    @function_tool("Clear internal history logs.", name="clear_history")
+    async def _clear_history(self) -> str:
+        return self.bot._clear_history(current_chat_id.get())
+
+
+class TurnBudget:
+    """
+    Bounds the tool rounds, time and tokens spent answering one message.
+    """
+
+    def __init__(
+        self,
+        max_tool_rounds: int,
+        max_seconds: float,
+        max_tokens: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_tool_rounds = max_tool_rounds
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.clock = clock
+        self.started_at = clock()
+        self.tool_rounds = 0
+        self.tokens = 0
+
+    def add_usage(self, usage: Any) -> None:
+        if usage is not None:
+            self.tokens += usage.total_tokens
+
+    def remaining_seconds(self) -> float:
+        return max(0.0, self.max_seconds - (self.clock() - self.started_at))
+
+    def exhausted(self) -> Optional[str]:
+        """
+        The limit that was reached, or None while the turn is within budget.
+        """
+        if self.tool_rounds >= self.max_tool_rounds:
+            return f"{self.tool_rounds} tool rounds"
+        if self.clock() - self.started_at >= self.max_seconds:
+            return f"{self.max_seconds}s"
+        if self.tokens >= self.max_tokens:
+            return f"{self.tokens} tokens"
+        return None
 
 
 class OpenAIChatBot:
@@ -11,136 +78,624 @@ class OpenAIChatBot:
         """You are a helpful assistant that always responds in raw text format."""
     )
 
-    TOOLS = [
-        {
-            "type": "function",
-            "function": {
-                "name": "clear_history",
-                "description": "Clear internal history logs.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {},
-                    "required": [],
-                    "additionalProperties": False,
-                },
-                "strict": True,
-            },
-        }
-    ]
-
-    HISTORY_LIMIT = 20
-
-    def __init__(self, api_key: str):
+    # estimated prompt tokens of chat history sent with every request
+    HISTORY_TOKEN_BUDGETS = {
+        "gpt-4o-mini": 8000,
+        "gpt-4o": 8000,
+        "gpt-3.5-turbo": 3000,
+    }
+    DEFAULT_HISTORY_TOKEN_BUDGET = 4000
+
+    # seconds idle connections to the API stay open between requests
+    KEEPALIVE_EXPIRY = 120
+
+    # work allowed to answer one message before the model must reply
+    MAX_TOOL_ROUNDS = 5
+    MAX_TURN_SECONDS = 30.0
+    MAX_TURN_TOKENS = 20_000
+    # seconds a request forced to answer gets when the turn is out of time
+    MIN_REQUEST_SECONDS = 5.0
+
+    # past this share of its token budget, older history is summarized in the
+    # background, keeping this share of the budget of recent messages as is
+    SUMMARY_THRESHOLD = 0.75
+    SUMMARY_KEEP = 0.25
+    SUMMARY_MAX_TOKENS = 300
+    # summaries are optional, they are not retried and give up quickly
+    SUMMARY_TIMEOUT = 5.0
+    SUMMARY_INSTRUCTIONS = (
+        "Summarize this conversation in a few sentences. Keep the facts, names, "
+        "preferences and open questions needed to continue it."
+    )
+    SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+    # sent instead of a reply while the API is unavailable
+    UNAVAILABLE_REPLY = "Sorry, I can't answer right now. Please try again shortly."
+
+    def __init__(
+        self,
+        api_key: str,
+        store: ConversationStore = None,
+        guard: RequestGuard = None,
+        response_cache: ResponseCache = None,
+        router: ModelRouter = None,
+        max_tool_rounds: int = MAX_TOOL_ROUNDS,
+        max_turn_seconds: float = MAX_TURN_SECONDS,
+        max_turn_tokens: int = MAX_TURN_TOKENS,
+    ):
         self.logger = logging.getLogger(self.__class__.__name__)
-        self.client = AsyncOpenAI(api_key=api_key, timeout=10)
-        self.handlers: List[ExternalToolsHandler] = []
-        self.tools = list(OpenAIChatBot.TOOLS)
-        self.history = [
-            {"role": "system", "content": self.INSTRUCTIONS},
-        ]
+        self.api_key = api_key
+        self._client: "AsyncOpenAI" = None
+        self.guard = guard if guard is not None else RequestGuard()
+        self.response_cache = response_cache
+        self.router = router if router is not None else ModelRouter()
+        self.max_tool_rounds = max_tool_rounds
+        self.max_turn_seconds = max_turn_seconds
+        self.max_turn_tokens = max_turn_tokens
+        self._summaries: Dict[Hashable, asyncio.Task] = {}
+        self.registry = ToolRegistry()
+        self.registry.register(HistoryTools(self))
+        self.system_message = {"role": "system", "content": self.INSTRUCTIONS}
+        self._tools_fingerprint: Tuple[Tuple[Any, ...], str] = (None, None)
+        self.store = store if store is not None else InMemoryConversationStore()
         self.logger.info("BotGPT initialized.")
 
+    @property
+    def client(self) -> "AsyncOpenAI":
+        if self._client is None:
+            import httpx
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+            # retries are left to the request guard
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                timeout=10,
+                max_retries=0,
+                http_client=DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=100, keepalive_expiry=self.KEEPALIVE_EXPIRY
+                    )
+                ),
+            )
+        return self._client
+
+    @client.setter
+    def client(self, client: "AsyncOpenAI") -> None:
+        self._client = client
+
+    async def aclose(self) -> None:
+        await self.wait_background_tasks()
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def wait_background_tasks(self) -> None:
+        """
+        Wait for the history summaries started after earlier replies.
+        """
+        while self._summaries:
+            results = await asyncio.gather(
+                *self._summaries.values(), return_exceptions=True
+            )
+            # the reply is already sent, a failed summary must not fail the turn
+            for result in results:
+                if isinstance(result, Exception):
+                    self.logger.error(
+                        "summarizing chat history failed: %s", result, exc_info=result
+                    )
+
     def register_external_tools(self, handler: ExternalToolsHandler) -> None:
         # check if the handler is a subclass of ExternalToolsHandler
         if not issubclass(handler.__class__, ExternalToolsHandler):
             raise TypeError("handler must be a subclass of ExternalToolsHandler.")
-        # check if the handler is already registered
-        # if not, register the handler and add its tools to the list
-        if not handler in self.handlers:
-            self.handlers.append(handler)
-            self.tools.extend(handler.tools)
+        # register the handler unless it is already registered
+        if self.registry.register(handler):
             self.logger.info("registered external tools handler: %s", handler)
 
-    async def send_message(self, message: str, model: str = "gpt-4o-mini") -> str:
-        # add user message to history
+    def register_deferred_tools(
+        self,
+        handler_class: Type[ExternalToolsHandler],
+        factory: Callable[[], ExternalToolsHandler] = None,
+    ) -> None:
+        """
+        Register the tools declared by a handler class without constructing it
+        until the model calls one of them.
+        """
+        if not issubclass(handler_class, ExternalToolsHandler):
+            raise TypeError("handler must be a subclass of ExternalToolsHandler.")
+        if self.registry.register_deferred(handler_class, factory):
+            self.logger.info("registered deferred tools handler: %s", handler_class)
+
+    async def send_message(
+        self, chat_id: Hashable, message: str, model: str = None
+    ) -> str:
+        history_tokens = self.store.token_count(chat_id)
+        model = model or self._route(message, history_tokens)
+        # replies to messages without earlier context can be shared by chats
+        standalone = self.response_cache is not None and history_tokens == 0
+        if standalone:
+            reply = self.response_cache.get(self._cache_scope(model), message)
+            metrics.count(
+                "response_cache.misses" if reply is None else "response_cache.hits"
+            )
+            if reply is not None:
+                self.logger.info("answered from the response cache")
+                self._add_user_message(chat_id, message)
+                self._add_assistant_message(
+                    chat_id, {"role": "assistant", "content": reply}
+                )
+                self.store.flush()
+                return reply
+
+        self._add_user_message(chat_id, message)
+        try:
+            reply, model = await self._generate_response(chat_id, model)
+        except UpstreamUnavailableError as e:
+            self.logger.warning("could not generate a response: %s", e)
+            return self.UNAVAILABLE_REPLY
+        finally:
+            # persist the history
+            self.store.flush()
+
+        # replies that needed tools depend on more than the prompt
+        if standalone and reply and len(self.store.load(chat_id)) == 2:
+            self.response_cache.set(self._cache_scope(model), message, reply)
+        self._schedule_summary(chat_id, model)
+        return reply
+
+    async def stream_message(
+        self, chat_id: Hashable, message: str, model: str = None
+    ) -> AsyncIterator[str]:
+        """
+        Send a message and yield the reply text as it is generated.
+        """
+        model = model or self._route(message, self.store.token_count(chat_id))
+        self._add_user_message(chat_id, message)
+        try:
+            async for delta in self._stream_response(chat_id, model):
+                yield delta
+        except UpstreamUnavailableError as e:
+            self.logger.warning("could not generate a response: %s", e)
+            yield self.UNAVAILABLE_REPLY
+            return
+        finally:
+            # persist the history
+            self.store.flush()
+        self._schedule_summary(chat_id, model)
+
+    def _add_user_message(self, chat_id: Hashable, message: str) -> None:
+        # add user message to the chat history
         segment = {"role": "user", "content": message}
-        self.history.append(segment)
+        self.store.append(chat_id, [segment])
         # log the user message
-        self.logger.info("added to history the user message: %s", message)
-        response = await self._generate_response(model)
-        # trim the history
-        self._trim_history()
-        return response
+        self.logger.debug("added to history the user message: %s", message)
+
+    def _route(self, message: str, history_tokens: int) -> str:
+        features = self.router.features(message, history_tokens)
+        model = self.router.route(features)
+        self.logger.debug("routed turn %s to %s", features, model)
+        return model
+
+    def _completion_params(
+        self, chat_id: Hashable, model: str, final: bool = False
+    ) -> Dict[str, Any]:
+        # keep the history within the token budget of the model
+        self._trim_history(chat_id, model)
+        params = dict(
+            model=model,
+            tools=self.registry.tools,
+            messages=[self.system_message] + self.store.load(chat_id),
+            n=1,
+            temperature=0.8,
+            top_p=0.8,
+            max_tokens=256,
+            frequency_penalty=0,
+            presence_penalty=0,
+        )
+        params.update(self.router.params(model))
+        if final:
+            # once the budget is spent, the model must answer with what it has
+            params["tool_choice"] = "none"
+        return params
+
+    async def _create_completion(
+        self, chat_id: Hashable, model: str, budget: TurnBudget, final: bool, **options
+    ) -> Tuple[Any, str]:
+        """
+        Request a completion from `model`, or from its fallback when it fails,
+        within the time left to the turn. Returns the response and the model
+        that answered.
+        """
+        try:
+            return await asyncio.wait_for(
+                self._complete(chat_id, model, final, options),
+                self._time_left(budget),
+            )
+        except asyncio.TimeoutError as e:
+            metrics.count("turn.timeouts")
+            raise UpstreamUnavailableError(
+                f"no response within the turn budget of {budget.max_seconds}s"
+            ) from e
+
+    async def _complete(
+        self, chat_id: Hashable, model: str, final: bool, options: Dict[str, Any]
+    ) -> Tuple[Any, str]:
+        params = self._completion_params(chat_id, model, final)
+        fallback = self.router.fallback(model)
+        if fallback is None:
+            return await self._guarded(params, options), model
+
+        # give up on the primary model quickly when there is another one
+        try:
+            return await self._guarded(params, options, max_retries=0), model
+        except CircuitOpenError:
+            raise
+        except UpstreamUnavailableError as e:
+            self.logger.warning(
+                "model %s failed (%s), falling back to %s", model, e, fallback
+            )
+        # the fallback may have a smaller history budget
+        params = self._completion_params(chat_id, fallback, final)
+        return await self._guarded(params, options), fallback
 
-    async def _generate_response(self, model="gpt-4o-mini") -> str:
+    async def _guarded(
+        self, params: Dict[str, Any], options: Dict[str, Any], max_retries: int = None
+    ) -> Any:
+        # rate limits count the prompt and the longest possible reply
+        tokens = params["max_tokens"] + sum(map(estimate_tokens, params["messages"]))
+        return await self.guard.run(
+            self._request(params, options), tokens, max_retries=max_retries
+        )
+
+    def _request(
+        self, params: Dict[str, Any], options: Dict[str, Any]
+    ) -> Callable[[], Any]:
+        async def request() -> Any:
+            with metrics.span("openai.request", model=params["model"]):
+                return await self.client.chat.completions.create(**params, **options)
+
+        return request
+
+    def _cache_scope(self, model: str) -> str:
+        # cached replies are only valid for the same model, prompt and tools;
+        # the tools tuple is replaced on registration, so it keys the fingerprint
+        tools, fingerprint = self._tools_fingerprint
+        if tools is not self.registry.tools:
+            tools = self.registry.tools
+            fingerprint = hashlib.sha256(
+                json.dumps([self.system_message, tools]).encode()
+            ).hexdigest()
+            self._tools_fingerprint = (tools, fingerprint)
+        return f"{model}:{fingerprint}"
+
+    def _new_budget(self) -> TurnBudget:
+        return TurnBudget(
+            self.max_tool_rounds, self.max_turn_seconds, self.max_turn_tokens
+        )
+
+    def _add_usage(self, budget: TurnBudget, usage: Any, model: str) -> None:
+        if usage is None:
+            return
+        budget.add_usage(usage)
+        metrics.count("openai.prompt_tokens", usage.prompt_tokens, model=model)
+        metrics.count("openai.completion_tokens", usage.completion_tokens, model=model)
+
+    @staticmethod
+    def _record_turn(budget: TurnBudget) -> None:
+        metrics.count("turn.tool_rounds", budget.tool_rounds)
+        metrics.count("turn.tokens", budget.tokens)
+
+    def _time_left(self, budget: TurnBudget) -> float:
+        # retries and backoff of a request must not outlast the turn either
+        return max(budget.remaining_seconds(), self.MIN_REQUEST_SECONDS)
+
+    async def _read_stream(
+        self, stream: AsyncIterator[Any], budget: TurnBudget
+    ) -> AsyncIterator[Any]:
+        # a slow stream is cut off when the turn runs out of time
+        chunks = stream.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(
+                    chunks.__anext__(), self._time_left(budget)
+                )
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError as e:
+                metrics.count("turn.timeouts")
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    await close()
+                raise UpstreamUnavailableError(
+                    f"stream cut off by the turn budget of {budget.max_seconds}s"
+                ) from e
+            yield chunk
+
+    def _budget_spent(self, budget: TurnBudget) -> bool:
+        reason = budget.exhausted()
+        if reason is None:
+            return False
+        self.logger.warning("turn budget exhausted after %s, forcing a reply", reason)
+        return True
+
+    async def _generate_response(
+        self, chat_id: Hashable, model: str
+    ) -> Tuple[Optional[str], str]:
+        """
+        Returns the reply and the model that answered last.
+        """
+        budget = self._new_budget()
         while True:
             # make request to OpenAI
-            response = await self.client.chat.completions.create(
-                model=model,
-                tools=self.tools,
-                messages=self.history,
-                n=1,
-                temperature=0.8,
-                top_p=0.8,
-                max_tokens=256,
-                frequency_penalty=0,
-                presence_penalty=0,
+            final = self._budget_spent(budget)
+            response, answered_by = await self._create_completion(
+                chat_id, model, budget, final
             )
+            self._add_usage(budget, getattr(response, "usage", None), answered_by)
 
             # break if there are no choices in the response
             if len(response.choices) == 0:
-                break
+                self._record_turn(budget)
+                return None, answered_by
 
             # add the assistant response to the history
-            self.history.append(response.choices[0].message)
-            self.logger.info(
-                "added to history the assistant response: %s",
-                response.choices[0].message.content,
-            )
+            segment = self._to_history_message(response.choices[0].message)
+            if final:
+                segment.pop("tool_calls", None)
+            self._add_assistant_message(chat_id, segment)
 
             # check if there are any tool calls in the response
-            tool_calls = response.choices[0].message.tool_calls
-            if tool_calls is not None and len(tool_calls) > 0:
-                for tool_call in response.choices[0].message.tool_calls:
-                    name = tool_call.function.name
-                    args = json.loads(tool_call.function.arguments)
-                    result = self._call_function(name, args)
-                    self.logger.info(
-                        "ai bot called function %s with args %s", name, args
-                    )
-                    # print a useful log message
-                    self.history.append(
+            if "tool_calls" in segment:
+                await self._run_tool_calls(chat_id, segment["tool_calls"])
+                budget.tool_rounds += 1
+                # continue to generate response with the updated history
+                continue
+
+            # if there are no tool calls, return
+            self._record_turn(budget)
+            return segment["content"], answered_by
+
+    async def _stream_response(
+        self, chat_id: Hashable, model: str
+    ) -> AsyncIterator[str]:
+        budget = self._new_budget()
+        while True:
+            # make a streaming request to OpenAI
+            final = self._budget_spent(budget)
+            stream, answered_by = await self._create_completion(
+                chat_id,
+                model,
+                budget,
+                final,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+
+            content = []
+            tool_calls: Dict[int, Dict[str, Any]] = {}
+            async for chunk in self._read_stream(stream, budget):
+                # usage arrives in a last chunk without choices
+                self._add_usage(budget, getattr(chunk, "usage", None), answered_by)
+                if len(chunk.choices) == 0:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    content.append(delta.content)
+                    yield delta.content
+                # tool calls arrive in fragments, keyed by their index
+                for fragment in delta.tool_calls or []:
+                    tool_call = tool_calls.setdefault(
+                        fragment.index,
                         {
-                            "role": "tool",
-                            "tool_call_id": tool_call.id,
-                            "content": str(result),
-                        }
-                    )
-                    self.logger.info(
-                        "added to history the function call (%s, %s)",
-                        str(name),
-                        str(result),
+                            "id": None,
+                            "type": "function",
+                            "function": {"name": "", "arguments": ""},
+                        },
                     )
+                    if fragment.id:
+                        tool_call["id"] = fragment.id
+                    if fragment.function and fragment.function.name:
+                        tool_call["function"]["name"] += fragment.function.name
+                    if fragment.function and fragment.function.arguments:
+                        tool_call["function"][
+                            "arguments"
+                        ] += fragment.function.arguments
+
+            # add the assistant response to the history
+            segment = {"role": "assistant", "content": "".join(content) or None}
+            if final:
+                tool_calls.clear()
+            if tool_calls:
+                segment["tool_calls"] = [
+                    tool_calls[index] for index in sorted(tool_calls)
+                ]
+            self._add_assistant_message(chat_id, segment)
+
+            # check if there are any tool calls in the response
+            if tool_calls:
+                await self._run_tool_calls(chat_id, segment["tool_calls"])
+                budget.tool_rounds += 1
                 # continue to generate response with the updated history
                 continue
 
-            # if there are no tool calls, return
-            return response.choices[0].message.content
+            self._record_turn(budget)
+            return
 
-    def _call_function(self, function_name: str, args: dict) -> str:
-        # check if the function is an internal tool
-        if function_name == "clear_history":
-            return self._clear_history()
+    def _add_assistant_message(
+        self, chat_id: Hashable, segment: Dict[str, Any]
+    ) -> None:
+        self.store.append(chat_id, [segment])
+        self.logger.debug(
+            "added to history the assistant response: %s", segment["content"]
+        )
+
+    async def _run_tool_calls(
+        self, chat_id: Hashable, tool_calls: List[Dict[str, Any]]
+    ) -> None:
+        # run all tool calls of this turn concurrently
+        token = current_chat_id.set(chat_id)
+        try:
+            results = await asyncio.gather(
+                *(
+                    self._call_function(
+                        tool_call["function"]["name"],
+                        tool_call["function"]["arguments"],
+                    )
+                    for tool_call in tool_calls
+                )
+            )
+        finally:
+            current_chat_id.reset(token)
+
+        for tool_call, result in zip(tool_calls, results):
+            self.store.append(
+                chat_id,
+                [
+                    {
+                        "role": "tool",
+                        "tool_call_id": tool_call["id"],
+                        "content": str(result),
+                    }
+                ],
+            )
+            self.logger.debug(
+                "added to history the function call (%s, %s)",
+                tool_call["function"]["name"],
+                result,
+            )
 
-        # check if the function is an external tool
-        for handler in self.handlers:
-            if handler.has_function(function_name):
-                return handler.call_function(function_name, args)
+    async def _call_function(self, function_name: str, arguments: str) -> str:
+        function = self.registry.get(function_name)
 
         # if the function is not found, return an error message
-        return f"Function {function_name} not found."
+        if function is None:
+            return f"Function {function_name} not found."
+
+        # arguments cut off by the token limit must still get a tool result
+        try:
+            args = json.loads(arguments or "{}")
+        except ValueError as e:
+            self.logger.warning(
+                "function %s got invalid arguments: %s", function_name, e
+            )
+            return f"Function {function_name} failed: invalid arguments"
 
-    def _clear_history(self) -> str:
-        # clear the history, keeping only the first and last elements
-        deleted_messages = max(0, len(self.history) - 2)
-        self.history = list([self.history[0], self.history[-1]])
+        self.logger.info("ai bot called function %s with args %s", function_name, args)
+        try:
+            with metrics.span("tool.call", tool=function_name):
+                return await asyncio.wait_for(function.call(args), function.timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning("function %s timed out", function_name)
+            metrics.count("tool.timeouts", tool=function_name)
+            return f"Function {function_name} timed out."
+        except Exception as e:
+            self.logger.error("function %s failed: %s", function_name, e, exc_info=True)
+            return f"Function {function_name} failed: {e}"
+
+    def _clear_history(self, chat_id: Hashable) -> str:
+        # clear the history, keeping only the last element
+        history = self.store.load(chat_id)
+        deleted_messages = max(0, len(history) - 1)
+        self.store.replace(chat_id, history[-1:])
         self.logger.warning(
             "deleted chat history. Total deleted messages: %d", deleted_messages
         )
         return "History has been cleared."
 
-    def _trim_history(self) -> None:
-        if len(self.history) > OpenAIChatBot.HISTORY_LIMIT:
-            self.history = [self.history[0]] + self.history[
-                -1 * OpenAIChatBot.HISTORY_LIMIT :
+    def _history_budget(self, model: str) -> int:
+        return self.HISTORY_TOKEN_BUDGETS.get(model, self.DEFAULT_HISTORY_TOKEN_BUDGET)
+
+    def _trim_history(self, chat_id: Hashable, model: str) -> None:
+        deleted_messages = self.store.trim(chat_id, self._history_budget(model))
+        if deleted_messages > 0:
+            self.logger.info(
+                "trimmed chat history. Total deleted messages: %d", deleted_messages
+            )
+
+    def _schedule_summary(self, chat_id: Hashable, model: str) -> None:
+        # summarize off the critical path, once at a time per chat
+        budget = self._history_budget(model)
+        if chat_id in self._summaries:
+            return
+        if self.store.token_count(chat_id) <= budget * self.SUMMARY_THRESHOLD:
+            return
+        task = asyncio.create_task(self._summarize_history(chat_id, model, budget))
+        self._summaries[chat_id] = task
+        task.add_done_callback(lambda _: self._summaries.pop(chat_id, None))
+
+    async def _summarize_history(
+        self, chat_id: Hashable, model: str, budget: int
+    ) -> None:
+        """
+        Replace the older messages of a chat with a summary of them.
+        """
+        history = self.store.load(chat_id)
+        start = trim_start(
+            [message["role"] for message in history],
+            [estimate_tokens(message) for message in history],
+            int(budget * self.SUMMARY_KEEP),
+        )
+        # a summary of a single message is not shorter than the message
+        if start < 2:
+            return
+
+        older = history[:start]
+        transcript = "\n".join(
+            f"{message['role']}: {message['content']}"
+            for message in older
+            if message.get("content")
+        )
+        messages = [
+            {"role": "system", "content": self.SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": transcript},
+        ]
+        try:
+            response = await asyncio.wait_for(
+                self.guard.run(
+                    lambda: self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        n=1,
+                        temperature=0.2,
+                        max_tokens=self.SUMMARY_MAX_TOKENS,
+                    ),
+                    self.SUMMARY_MAX_TOKENS + sum(map(estimate_tokens, messages)),
+                    max_retries=0,
+                ),
+                self.SUMMARY_TIMEOUT,
+            )
+        except Exception as e:
+            self.logger.warning("could not summarize chat history: %s", e)
+            return
+        if not response.choices or not response.choices[0].message.content:
+            return
+
+        # messages may have been added or cleared while the summary was made
+        current = self.store.load(chat_id)
+        if current[:start] != older:
+            self.logger.info("chat history changed, dropping its summary")
+            return
+        summary = self.SUMMARY_PREFIX + response.choices[0].message.content
+        self.store.replace(
+            chat_id, [{"role": "system", "content": summary}] + current[start:]
+        )
+        self.store.flush()
+        self.logger.info("summarized chat history. Total replaced messages: %d", start)
+
+    @staticmethod
+    def _to_history_message(message: "ChatCompletionMessage") -> Dict[str, Any]:
+        # keep only the fields the chat completions API accepts back as input
+        segment = {"role": "assistant", "content": message.content}
+        if message.tool_calls:
+            segment["tool_calls"] = [
+                {
+                    "id": tool_call.id,
+                    "type": "function",
+                    "function": {
+                        "name": tool_call.function.name,
+                        "arguments": tool_call.function.arguments,
+                    },
+                }
+                for tool_call in message.tool_calls
             ]
+        return segment
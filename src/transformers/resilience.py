@@ -0,0 +1,148 @@
+import random
+import asyncio
+import logging
+
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional, TypeVar
+from utils import TokenBucket, CircuitBreaker
+
+_Result = TypeVar("_Result")
+
+
+class UpstreamUnavailableError(Exception):
+    """
+    The upstream API could not serve a request, even after retrying.
+    """
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """
+    The request was rejected without calling the upstream API, because it
+    failed repeatedly in the last moments.
+    """
+
+
+class RequestGuard:
+    """
+    Sends requests to the OpenAI API with client-side rate limits, retries
+    transient failures with jittered exponential backoff and stops calling
+    the API for a while when it keeps failing.
+    """
+
+    MAX_RETRIES = 4
+    BASE_DELAY = 0.5
+    MAX_DELAY = 20.0
+    # request timeouts, lock conflicts, rate limits and server errors
+    RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+    def __init__(
+        self,
+        max_retries: int = MAX_RETRIES,
+        base_delay: float = BASE_DELAY,
+        max_delay: float = MAX_DELAY,
+        requests_per_minute: float = None,
+        tokens_per_minute: float = None,
+        breaker: CircuitBreaker = None,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.requests = (
+            TokenBucket.per_minute(requests_per_minute, sleep=sleep)
+            if requests_per_minute
+            else None
+        )
+        self.tokens = (
+            TokenBucket.per_minute(tokens_per_minute, sleep=sleep)
+            if tokens_per_minute
+            else None
+        )
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.sleep = sleep
+        self.retries = 0
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def run(
+        self,
+        request: Callable[[], Awaitable[_Result]],
+        tokens: int = 0,
+        max_retries: int = None,
+    ) -> _Result:
+        """
+        Await `request()`, which is expected to use about `tokens` tokens,
+        retrying it on transient failures.
+        """
+        if max_retries is None:
+            max_retries = self.max_retries
+        if not self.breaker.allow():
+            raise CircuitOpenError("upstream API is unavailable")
+
+        attempt = 0
+        while True:
+            await self._throttle(tokens)
+            try:
+                result = await request()
+            except Exception as e:
+                if not self._is_retryable(e):
+                    # the API answered, the request itself was rejected
+                    self.breaker.record_success()
+                    raise
+                delay = self._retry_delay(e, attempt)
+                if attempt >= max_retries or delay is None:
+                    self.breaker.record_failure()
+                    raise UpstreamUnavailableError(str(e)) from e
+                self.logger.warning("request failed (%s), retrying in %.2fs", e, delay)
+                attempt += 1
+                self.retries += 1
+                await self.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def _throttle(self, tokens: int) -> None:
+        if self.requests is not None:
+            await self.requests.acquire()
+        if self.tokens is not None and tokens:
+            await self.tokens.acquire(tokens)
+
+    def _is_retryable(self, error: Exception) -> bool:
+        from openai import APIConnectionError
+
+        # connection errors include timeouts
+        if isinstance(error, APIConnectionError):
+            return True
+        return getattr(error, "status_code", None) in self.RETRYABLE_STATUS
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Seconds to wait before the next attempt, or None when the API asks
+        for a longer wait than `max_delay`.
+        """
+        retry_after = self._retry_after(error)
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        # full jitter keeps concurrent retries from arriving together
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        response = getattr(error, "response", None)
+        if response is None:
+            return None
+        headers = response.headers
+        try:
+            if "retry-after-ms" in headers:
+                return max(0.0, float(headers["retry-after-ms"]) / 1000)
+            if "retry-after" in headers:
+                value = headers["retry-after"]
+                try:
+                    return max(0.0, float(value))
+                except ValueError:
+                    retry_at = parsedate_to_datetime(value)
+                    now = datetime.now(timezone.utc)
+                    return max(0.0, (retry_at - now).total_seconds())
+        except (TypeError, ValueError):
+            pass
+        return None
@@ -0,0 +1,81 @@
+import re
+
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+from core import estimate_tokens
+
+
+class TurnFeatures(NamedTuple):
+    prompt_tokens: int
+    history_tokens: int
+    needs_tools: bool
+
+
+class RoutingRule(NamedTuple):
+    """
+    Sends a turn to `model` when it meets every condition that is set.
+    """
+
+    model: str
+    min_prompt_tokens: int = 0
+    min_history_tokens: int = 0
+    needs_tools: Optional[bool] = None
+
+    def matches(self, features: TurnFeatures) -> bool:
+        return (
+            features.prompt_tokens >= self.min_prompt_tokens
+            and features.history_tokens >= self.min_history_tokens
+            and self.needs_tools in (None, features.needs_tools)
+        )
+
+
+class ModelRouter:
+    """
+    Picks the model for each turn from the first matching rule, so cheap
+    turns go to a small model and hard ones to a stronger one.
+    """
+
+    DEFAULT_MODEL = "gpt-4o-mini"
+
+    # prompts that likely need a tool, like the clock or a web page
+    TOOL_HINTS = re.compile(
+        r"https?://|www\.|\b(time|date|today|tonight|tomorrow|yesterday|now"
+        r"|latest|current|news|weather|price|website|link|url)\b",
+        re.IGNORECASE,
+    )
+
+    def __init__(
+        self,
+        rules: Iterable[RoutingRule] = (),
+        default_model: str = DEFAULT_MODEL,
+        fallbacks: Dict[str, str] = None,
+        params: Dict[str, Dict[str, Any]] = None,
+    ):
+        self.rules = tuple(rules)
+        self.default_model = default_model
+        self.fallbacks = dict(fallbacks or {})
+        self._params = dict(params or {})
+
+    def features(self, prompt: str, history_tokens: int) -> TurnFeatures:
+        return TurnFeatures(
+            prompt_tokens=estimate_tokens({"content": prompt}),
+            history_tokens=history_tokens,
+            needs_tools=self.TOOL_HINTS.search(prompt) is not None,
+        )
+
+    def route(self, features: TurnFeatures) -> str:
+        for rule in self.rules:
+            if rule.matches(features):
+                return rule.model
+        return self.default_model
+
+    def fallback(self, model: str) -> Optional[str]:
+        """
+        The model to retry with when `model` times out or fails, if any.
+        """
+        return self.fallbacks.get(model)
+
+    def params(self, model: str) -> Dict[str, Any]:
+        """
+        Completion parameters overridden for `model`, like `max_tokens`.
+        """
+        return self._params.get(model, {})
@@ -1,2 +1,6 @@
 from .logging import LambdaLogger
 from .tools import TimeTools, WebTools
+from .cache import TTLCache, CachedToolsHandler, ResponseCache
+from .runtime import EventLoopRunner
+from .ratelimit import TokenBucket, CircuitBreaker
+from .telemetry import Metrics, InMemorySink, EMFSink, metrics
@@ -0,0 +1,237 @@
+import re
+import json
+import time
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Optional, Set, Tuple
+from core import ExternalToolsHandler
+from .telemetry import metrics
+
+
+class TTLCache:
+    """
+    Size-bounded LRU cache whose entries expire after a per-entry TTL.
+    """
+
+    MISSING = object()
+
+    def __init__(
+        self, maxsize: int = 1024, clock: Callable[[], float] = time.monotonic
+    ):
+        self.maxsize = maxsize
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Return the cached value, or `TTLCache.MISSING` if absent or expired.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return self.MISSING
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        self._entries[key] = (self.clock() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class CachedToolsHandler(ExternalToolsHandler):
+    """
+    Wraps a tools handler and caches the results of the calls it opts in to.
+    """
+
+    def __init__(self, handler: ExternalToolsHandler, cache: TTLCache = None):
+        self.handler = handler
+        self.tools = handler.tools
+        self.cache = cache if cache is not None else TTLCache()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.handler!r})"
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.handler})"
+
+    def has_function(self, name: str) -> bool:
+        return self.handler.has_function(name)
+
+    def get_timeout(self, name: str) -> float:
+        return self.handler.get_timeout(name)
+
+    def call_function(self, name: str, args: Dict[str, Any]) -> str:
+        ttl = self.handler.get_cache_ttl(name, args)
+        if ttl is None:
+            return self.handler.call_function(name, args)
+
+        key = self._key(name, args)
+        result = self.cache.get(key)
+        if result is TTLCache.MISSING:
+            metrics.count("tool_cache.misses", tool=name)
+            result = self.handler.call_function(name, args)
+            self._store(key, name, result, ttl)
+        else:
+            metrics.count("tool_cache.hits", tool=name)
+        return result
+
+    async def call_function_async(self, name: str, args: Dict[str, Any]) -> str:
+        ttl = self.handler.get_cache_ttl(name, args)
+        if ttl is None:
+            return await self.handler.call_function_async(name, args)
+
+        key = self._key(name, args)
+        result = self.cache.get(key)
+        if result is TTLCache.MISSING:
+            metrics.count("tool_cache.misses", tool=name)
+            result = await self.handler.call_function_async(name, args)
+            self._store(key, name, result, ttl)
+        else:
+            metrics.count("tool_cache.hits", tool=name)
+        return result
+
+    def _store(self, key: Hashable, name: str, result: str, ttl: float) -> None:
+        if self.handler.is_cacheable_result(name, result):
+            self.cache.set(key, result, ttl)
+
+    @staticmethod
+    def _key(name: str, args: Dict[str, Any]) -> Tuple[str, str]:
+        # canonicalize the arguments so equivalent calls share an entry
+        return name, json.dumps(args, sort_keys=True, separators=(",", ":"))
+
+
+class ResponseCache:
+    """
+    Replies to standalone prompts, looked up by exact normalized prompt and
+    optionally by character n-gram similarity to an earlier prompt.
+    """
+
+    TTL = 3600.0
+    # n-gram Jaccard similarity above which two prompts share a reply
+    SIMILARITY = 0.0
+    NGRAM_SIZE = 3
+
+    _WHITESPACE = re.compile(r"\s+")
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = TTL,
+        similarity: float = SIMILARITY,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.similarity = similarity
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self._replies = TTLCache(maxsize, clock)
+        # n-grams of the cached prompts, in the order they were cached
+        self._ngrams: OrderedDict[Tuple[str, str], FrozenSet[str]] = OrderedDict()
+        # the cached prompts of a scope that contain an n-gram
+        self._index: Dict[Tuple[str, str], Set[Tuple[str, str]]] = {}
+        self._maxsize = maxsize
+
+    def __len__(self) -> int:
+        return len(self._replies)
+
+    def get(self, scope: str, prompt: str) -> Optional[str]:
+        """
+        Return the reply cached for `prompt` in `scope`, or None.
+        """
+        key = (scope, self.normalize(prompt))
+        reply = self._replies.get(key)
+        if reply is not TTLCache.MISSING:
+            self.exact_hits += 1
+            return reply
+        if self.similarity > 0:
+            reply = self._get_similar(key)
+            if reply is not None:
+                self.similar_hits += 1
+                return reply
+        self.misses += 1
+        return None
+
+    def set(self, scope: str, prompt: str, reply: str) -> None:
+        key = (scope, self.normalize(prompt))
+        self._replies.set(key, reply, self.ttl)
+        if self.similarity > 0:
+            self._forget(key)
+            ngrams = self._ngrams[key] = self._ngrams_of(key[1])
+            for ngram in ngrams:
+                self._index.setdefault((key[0], ngram), set()).add(key)
+            while len(self._ngrams) > self._maxsize:
+                self._forget(next(iter(self._ngrams)))
+
+    def clear(self) -> None:
+        self._replies.clear()
+        self._ngrams.clear()
+        self._index.clear()
+
+    @property
+    def hits(self) -> int:
+        return self.exact_hits + self.similar_hits
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @classmethod
+    def normalize(cls, prompt: str) -> str:
+        # case, spacing and trailing punctuation rarely change the answer
+        return cls._WHITESPACE.sub(" ", prompt.casefold()).strip().rstrip("?!. ")
+
+    def _get_similar(self, key: Tuple[str, str]) -> Optional[str]:
+        scope, prompt = key
+        ngrams = self._ngrams_of(prompt)
+        # only prompts sharing an n-gram can be similar, count what they share
+        shared: Dict[Tuple[str, str], int] = {}
+        for ngram in ngrams:
+            for candidate in self._index.get((scope, ngram), ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        best, best_score = None, self.similarity
+        for candidate, common in shared.items():
+            union = len(ngrams) + len(self._ngrams[candidate]) - common
+            score = common / union
+            if score >= best_score:
+                best, best_score = candidate, score
+        if best is None:
+            return None
+        reply = self._replies.get(best)
+        if reply is TTLCache.MISSING:
+            self._forget(best)
+            return None
+        return reply
+
+    def _forget(self, key: Tuple[str, str]) -> None:
+        ngrams = self._ngrams.pop(key, ())
+        for ngram in ngrams:
+            keys = self._index[(key[0], ngram)]
+            keys.discard(key)
+            if not keys:
+                del self._index[(key[0], ngram)]
+
+    def _ngrams_of(self, prompt: str) -> FrozenSet[str]:
+        padded = f" {prompt} "
+        size = self.NGRAM_SIZE
+        return frozenset(padded[i : i + size] for i in range(len(padded) - size + 1))
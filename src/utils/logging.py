@@ -1,12 +1,83 @@
+import json
+import time
+import zlib
+import random
 import logging
 
-from typing import TypeAlias
+from contextvars import ContextVar
+from typing import Dict, TypeAlias
+
+# id of the Lambda invocation being handled, added to every log line
+request_id: ContextVar[str] = ContextVar("request_id", default=None)
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line, truncating long messages.
+    """
+
+    MAX_MESSAGE_CHARS = 2000
+    TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+    converter = time.gmtime
+
+    def __init__(self, max_message_chars: int = MAX_MESSAGE_CHARS):
+        super().__init__()
+        self.max_message_chars = max_message_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        # arguments are only rendered here, for records that are emitted
+        message = record.getMessage()
+        if len(message) > self.max_message_chars:
+            dropped = len(message) - self.max_message_chars
+            message = f"{message[:self.max_message_chars]}... [{dropped} more chars]"
+        entry = {
+            "time": f"{self.formatTime(record, self.TIME_FORMAT)}.{record.msecs:03.0f}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": message,
+        }
+        if getattr(record, "request_id", None) is not None:
+            entry["request_id"] = record.request_id
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Adds the current request id to records and samples the records below
+    WARNING of noisy loggers.
+
+    Sampling is decided per request and logger, so a sampled request keeps
+    all of its lines from that logger.
+    """
+
+    def __init__(self, sampling: Dict[str, float] = None):
+        super().__init__()
+        self.sampling = dict(sampling or {})
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        if record.levelno >= logging.WARNING or not self.sampling:
+            return True
+        rate = self.sampling.get(record.name)
+        if rate is None:
+            return True
+        if record.request_id is None:
+            return random.random() < rate
+        key = f"{record.request_id}:{record.name}".encode()
+        return zlib.crc32(key) / 0xFFFFFFFF < rate
 
 
 class LambdaLogger:
     _Level: TypeAlias = int | str
 
-    def __init__(self, log_level: _Level = None):
+    def __init__(
+        self,
+        log_level: _Level = None,
+        max_message_chars: int = JSONFormatter.MAX_MESSAGE_CHARS,
+        sampling: Dict[str, float] = None,
+    ):
         if not log_level:
             log_level = logging.INFO
 
@@ -16,9 +87,33 @@ class LambdaLogger:
             logging.basicConfig(level=log_level)
 
         self.logger = logging.getLogger()
+        # records of every logger pass through the root handlers
+        formatter = JSONFormatter(max_message_chars)
+        context_filter = RequestContextFilter(sampling)
+        for handler in self.logger.handlers:
+            handler.setFormatter(formatter)
+            for existing in list(handler.filters):
+                if isinstance(existing, RequestContextFilter):
+                    handler.removeFilter(existing)
+            handler.addFilter(context_filter)
+
+    def set_request_id(self, value: str) -> None:
+        """
+        Correlate the log lines that follow with a request.
+        """
+        request_id.set(value)
+
+    def isEnabledFor(self, level: int) -> bool:
+        return self.logger.isEnabledFor(level)
+
+    def debug(self, message, *args, **kwargs):
+        self.logger.debug(message, *args, **kwargs)
 
     def info(self, message, *args, **kwargs):
         self.logger.info(message, *args, **kwargs)
 
+    def warning(self, message, *args, **kwargs):
+        self.logger.warning(message, *args, **kwargs)
+
     def error(self, message, *args, **kwargs):
         self.logger.error(message, *args, **kwargs)
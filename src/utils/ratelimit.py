@@ -0,0 +1,120 @@
+import time
+import asyncio
+
+from typing import Awaitable, Callable
+
+
+class TokenBucket:
+    """
+    Allows `rate` units per second on average, with bursts up to `capacity`.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = capacity
+        self._updated_at = clock()
+
+    @classmethod
+    def per_minute(cls, amount: float, **kwargs) -> "TokenBucket":
+        return cls(amount / 60.0, amount, **kwargs)
+
+    @property
+    def tokens(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def try_acquire(self, amount: float = 1) -> bool:
+        """
+        Take `amount` units if they are available right now.
+        """
+        self._refill()
+        # a request larger than the bucket is let through once it is full
+        amount = min(amount, self.capacity)
+        if self._tokens < amount:
+            return False
+        self._tokens -= amount
+        return True
+
+    def delay(self, amount: float = 1) -> float:
+        """
+        Seconds until `amount` units become available.
+        """
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    async def acquire(self, amount: float = 1) -> None:
+        """
+        Wait until `amount` units are available and take them.
+        """
+        while not self.try_acquire(amount):
+            await self.sleep(self.delay(amount))
+
+    def _refill(self) -> None:
+        now = self.clock()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing dependency for `reset_timeout` seconds after
+    `failure_threshold` consecutive failures, then lets one trial call through.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+
+    @property
+    def state(self) -> str:
+        if (
+            self._state == self.OPEN
+            and self.clock() - self._opened_at >= self.reset_timeout
+        ):
+            return self.HALF_OPEN
+        return self._state
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go through now. Once the circuit is half-open, one
+        trial call is let through per `reset_timeout`.
+        """
+        state = self.state
+        if state == self.HALF_OPEN:
+            # restart the timer, so other callers wait for the trial outcome
+            self._opened_at = self.clock()
+            return True
+        return state == self.CLOSED
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._state = self.CLOSED
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._state == self.OPEN or self.failures >= self.failure_threshold:
+            self._state = self.OPEN
+            self._opened_at = self.clock()
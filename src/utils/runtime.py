@@ -0,0 +1,56 @@
+import asyncio
+import logging
+
+from typing import Any, Awaitable, Callable, Coroutine, List, TypeVar
+
+_Result = TypeVar("_Result")
+
+
+class EventLoopRunner:
+    """
+    Runs coroutines on one long-lived event loop, so HTTP clients created on
+    it keep their pooled connections across Lambda invocations.
+    """
+
+    def __init__(self, use_uvloop: bool = False):
+        self.use_uvloop = use_uvloop
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._loop: asyncio.AbstractEventLoop = None
+        self._shutdown_callbacks: List[Callable[[], Awaitable[Any]]] = []
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None or self._loop.is_closed():
+            self._loop = self._new_event_loop()
+            asyncio.set_event_loop(self._loop)
+        return self._loop
+
+    def run(self, coroutine: Coroutine[Any, Any, _Result]) -> _Result:
+        return self.loop.run_until_complete(coroutine)
+
+    def add_shutdown_callback(self, callback: Callable[[], Awaitable[Any]]) -> None:
+        """
+        Register a coroutine function closing a resource bound to the loop.
+        """
+        self._shutdown_callbacks.append(callback)
+
+    def close(self) -> None:
+        if self._loop is None or self._loop.is_closed():
+            return
+        for callback in reversed(self._shutdown_callbacks):
+            try:
+                self._loop.run_until_complete(callback())
+            except Exception as e:
+                self.logger.error(f"Error in shutdown callback: {e}", exc_info=True)
+        self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+        self._loop.close()
+
+    def _new_event_loop(self) -> asyncio.AbstractEventLoop:
+        if self.use_uvloop:
+            try:
+                import uvloop
+
+                return uvloop.new_event_loop()
+            except ImportError:
+                self.logger.warning("uvloop is not installed, using asyncio loop")
+        return asyncio.new_event_loop()
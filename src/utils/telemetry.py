@@ -0,0 +1,167 @@
+import sys
+import json
+import time
+
+from typing import Any, Dict, List, NamedTuple, TextIO, Tuple
+from core import MetricsSink
+
+
+class MetricRecord(NamedTuple):
+    name: str
+    value: float
+    unit: str
+    dimensions: Dict[str, str]
+
+
+class _Span:
+    __slots__ = ("metrics", "name", "dimensions", "started")
+
+    def __init__(self, metrics: "Metrics", name: str, dimensions: Dict[str, str]):
+        self.metrics = metrics
+        self.name = name
+        self.dimensions = dimensions
+
+    def __enter__(self) -> "_Span":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        elapsed = (time.perf_counter() - self.started) * 1000
+        self.metrics.record(self.name, elapsed, "Milliseconds", **self.dimensions)
+        if exc_type is not None:
+            self.metrics.count(f"{self.name}.errors", **self.dimensions)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        pass
+
+
+class Metrics:
+    """
+    Records span timings and counts to a sink; does nothing without one.
+    """
+
+    _NULL_SPAN = _NullSpan()
+
+    def __init__(self, sink: MetricsSink = None):
+        self.sink = sink
+
+    def span(self, name: str, **dimensions: str):
+        """
+        Time the `with` block as `name`, in milliseconds.
+        """
+        if self.sink is None:
+            return self._NULL_SPAN
+        return _Span(self, name, dimensions)
+
+    def count(self, name: str, value: float = 1, **dimensions: str) -> None:
+        if self.sink is not None:
+            self.sink.record(name, value, "Count", dimensions)
+
+    def record(self, name: str, value: float, unit: str, **dimensions: str) -> None:
+        if self.sink is not None:
+            self.sink.record(name, value, unit, dimensions)
+
+    def flush(self) -> None:
+        if self.sink is not None:
+            self.sink.flush()
+
+
+class InMemorySink(MetricsSink):
+    """
+    Keeps every record, for tests and local runs.
+    """
+
+    def __init__(self):
+        self.records: List[MetricRecord] = []
+
+    def record(
+        self, name: str, value: float, unit: str, dimensions: Dict[str, str]
+    ) -> None:
+        self.records.append(MetricRecord(name, value, unit, dimensions))
+
+    def values(self, name: str) -> List[float]:
+        return [record.value for record in self.records if record.name == name]
+
+    def total(self, name: str) -> float:
+        return sum(self.values(name))
+
+    def clear(self) -> None:
+        self.records.clear()
+
+
+class EMFSink(MetricsSink):
+    """
+    Buffers records and writes them as CloudWatch embedded metric format log
+    lines, one per set of dimensions, when flushed.
+    """
+
+    NAMESPACE = "FohlFehBot"
+    MAX_VALUES = 100
+
+    def __init__(self, namespace: str = NAMESPACE, stream: TextIO = None):
+        self.namespace = namespace
+        self.stream = stream
+        self._groups: Dict[Tuple[Tuple[str, str], ...], Dict[str, Any]] = {}
+
+    def record(
+        self, name: str, value: float, unit: str, dimensions: Dict[str, str]
+    ) -> None:
+        key = tuple(sorted(dimensions.items()))
+        metrics = self._groups.setdefault(key, {})
+        if name not in metrics:
+            metrics[name] = (unit, [])
+        metrics[name][1].append(value)
+
+    def flush(self) -> None:
+        if not self._groups:
+            return
+        groups, self._groups = self._groups, {}
+        timestamp = int(time.time() * 1000)
+        stream = self.stream or sys.stdout
+        for key, metrics in groups.items():
+            longest = max(len(values) for _, values in metrics.values())
+            # CloudWatch takes at most MAX_VALUES values of a metric per line
+            for start in range(0, longest, self.MAX_VALUES):
+                chunk = {
+                    name: (unit, values[start : start + self.MAX_VALUES])
+                    for name, (unit, values) in metrics.items()
+                    if len(values) > start
+                }
+                line = self._line(timestamp, dict(key), chunk)
+                stream.write(json.dumps(line) + "\n")
+        stream.flush()
+
+    def _line(
+        self,
+        timestamp: int,
+        dimensions: Dict[str, str],
+        metrics: Dict[str, Tuple[str, List[float]]],
+    ) -> Dict[str, Any]:
+        return {
+            "_aws": {
+                "Timestamp": timestamp,
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": self.namespace,
+                        "Dimensions": [list(dimensions)],
+                        "Metrics": [
+                            {"Name": name, "Unit": unit}
+                            for name, (unit, _) in metrics.items()
+                        ],
+                    }
+                ],
+            },
+            **dimensions,
+            **{name: values for name, (_, values) in metrics.items()},
+        }
+
+
+# shared by the bot, the model and the Lambda handler, disabled until a sink is set
+metrics = Metrics()
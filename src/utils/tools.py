@@ -1,105 +1,184 @@
+import json
+import asyncio
 import datetime
-import requests
 
-from core import ExternalToolsHandler, FunctionTool
-from typing import Dict, List, Any, Optional, Literal, TypedDict
+from html.parser import HTMLParser
+from core import ExternalToolsHandler, function_tool
+from typing import TYPE_CHECKING, Dict, List, Any, Optional
+
+if TYPE_CHECKING:
+    import httpx
 
 
 class TimeTools(ExternalToolsHandler):
-    def __init__(self) -> None:
-        self.tools: List[FunctionTool] = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_time",
-                    "description": "Get current time using a specified format.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "format": {
-                                "type": "string",
-                                "description": "Python format string for the time.",
-                            }
-                        },
-                        "required": ["format"],
-                        "additionalProperties": False,
-                    },
-                    "strict": True,
-                },
-            },
-        ]
-
-    def has_function(self, name: str) -> bool:
-        return name in ["get_time"]
-
-    def call_function(self, name: str, args: Dict[str, Any]) -> str:
-        if name == "get_time":
-            return self._get_time(**args)
-        return "Unknown function"
+    CACHE_TTL = 1.0
+
+    def get_cache_ttl(self, name: str, args: Dict[str, Any]) -> Optional[float]:
+        return self.CACHE_TTL if name == "get_time" else None
 
+    @function_tool(
+        "Get current time using a specified format.",
+        name="get_time",
+        format="Python format string for the time.",
+    )
     def _get_time(self, format: str = "%I:%M%p - %B %d, %Y") -> str:
         current_time = datetime.datetime.now().strftime(format)
         return f"The current time is {current_time}."
 
 
 class WebTools(ExternalToolsHandler):
-    def __init__(self) -> None:
-        self.tools: List[FunctionTool] = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "http_request",
-                    "description": "Send HTTP request to a specified URL.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "method": {
-                                "type": "string",
-                                "description": "HTTP method: GET or POST.",
-                            },
-                            "url": {
-                                "type": "string",
-                                "description": "URL to send the request to.",
-                            },
-                            "headers": {
-                                "type": "string",
-                                "description": "HTTP JSON headers for the request. This is optional for GET requests.",
-                            },
-                            "body": {
-                                "type": "string",
-                                "description": "Body JSON data for POST requests. This is optional for GET requests.",
-                            },
-                        },
-                        "required": ["method", "url", "headers", "body"],
-                        "additionalProperties": False,
-                    },
-                    "strict": True,
-                },
-            },
-        ]
-
-    def has_function(self, name: str) -> bool:
-        return name in ["http_request"]
-
-    def call_function(self, name: str, args: Dict[str, Any]) -> str:
-        if name == "http_request":
-            return self._http_request(**args)
-        return "Unknown function"
-
-    def _http_request(
+    CONNECT_TIMEOUT = 3.0
+    READ_TIMEOUT = 10.0
+    TIMEOUT = 15.0
+    CACHE_TTL = 60.0
+    # bytes read from the response body before the rest is discarded
+    MAX_RESPONSE_BYTES = 512 * 1024
+    # characters of extracted text returned to the chat history
+    MAX_RESULT_CHARS = 4000
+
+    def __init__(
+        self,
+        connect_timeout: float = CONNECT_TIMEOUT,
+        read_timeout: float = READ_TIMEOUT,
+        max_response_bytes: int = MAX_RESPONSE_BYTES,
+        max_result_chars: int = MAX_RESULT_CHARS,
+        transport: "httpx.AsyncBaseTransport" = None,
+    ) -> None:
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_response_bytes = max_response_bytes
+        self.max_result_chars = max_result_chars
+        self.transport = transport
+        self._client: "httpx.AsyncClient" = None
+        self._client_loop: asyncio.AbstractEventLoop = None
+        super().__init__()
+
+    def get_cache_ttl(self, name: str, args: Dict[str, Any]) -> Optional[float]:
+        # only GET requests are idempotent
+        if name == "http_request" and str(args.get("method", "")).upper() == "GET":
+            return self.CACHE_TTL
+        return None
+
+    def is_cacheable_result(self, name: str, result: str) -> bool:
+        return result.startswith("Response: 2")
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        # the connection pool is bound to the event loop that created it
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=60),
+                follow_redirects=True,
+                transport=self.transport,
+            )
+            self._client_loop = loop
+        return self._client
+
+    @function_tool(
+        "Send HTTP request to a specified URL.",
+        name="http_request",
+        method="HTTP method: GET or POST.",
+        url="URL to send the request to.",
+        headers="HTTP JSON headers for the request. This is optional for GET requests.",
+        body="Body JSON data for POST requests. This is optional for GET requests.",
+    )
+    async def _http_request(
         self,
         method: str,
         url: str,
-        headers: Dict[str, str],
-        body: Optional[Dict[str, Any]] = None,
+        headers: str,
+        body: Optional[str] = None,
     ) -> str:
+        method = method.upper()
+        if method not in ["GET", "POST"]:
+            return f"Unsupported HTTP method: {method}"
         try:
-            if method.upper() == "GET":
-                response = requests.get(url, headers=headers)
-            elif method.upper() == "POST":
-                response = requests.post(url, headers=headers, json=body)
-            else:
-                return f"Unsupported HTTP method: {method}"
-            return f"Response: {response.status_code}, {response.text}"
+            client = self._get_client()
+            request = client.build_request(
+                method,
+                url,
+                headers=self._parse_json(headers),
+                json=self._parse_json(body) if method == "POST" else None,
+            )
+            response = await client.send(request, stream=True)
+            try:
+                content = await self._read_capped(response)
+            finally:
+                await response.aclose()
+            return f"Response: {response.status_code}, {self._extract_text(response, content)}"
         except Exception as e:
             return f"HTTP request failed: {str(e)}"
+
+    async def _read_capped(self, response: "httpx.Response") -> bytes:
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= self.max_response_bytes:
+                break
+        return b"".join(chunks)[: self.max_response_bytes]
+
+    def _extract_text(self, response: "httpx.Response", content: bytes) -> str:
+        content_type = response.headers.get("content-type", "").split(";")[0].strip()
+        if content and not self._is_textual(content_type):
+            return f"[{len(content)} bytes of {content_type} content omitted]"
+
+        text = content.decode(response.charset_encoding or "utf-8", errors="replace")
+        if content_type in ["text/html", "application/xhtml+xml"]:
+            text = _HTMLTextExtractor.extract(text)
+
+        if len(text) > self.max_result_chars:
+            text = text[: self.max_result_chars] + " ... [truncated]"
+        return text
+
+    @staticmethod
+    def _is_textual(content_type: str) -> bool:
+        return (
+            not content_type
+            or content_type.startswith("text/")
+            or content_type.endswith(("json", "xml", "javascript"))
+        )
+
+    @staticmethod
+    def _parse_json(value: Dict[str, Any] | str | None) -> Dict[str, Any] | None:
+        # the model sends headers and body as JSON strings, python callers dicts
+        if isinstance(value, str):
+            return json.loads(value) if value.strip() else None
+        return value
+
+
+class _HTMLTextExtractor(HTMLParser):
+    SKIPPED_TAGS = frozenset(["script", "style", "noscript", "template", "svg"])
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.skipping = 0
+
+    @classmethod
+    def extract(cls, html: str) -> str:
+        parser = cls()
+        parser.feed(html)
+        parser.close()
+        return " ".join(" ".join(parser.parts).split())
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self.skipping += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS and self.skipping > 0:
+            self.skipping -= 1
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
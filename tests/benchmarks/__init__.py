@@ -0,0 +1,9 @@
+import os
+import unittest
+
+# benchmarks are slow and depend on the machine, run them with RUN_BENCHMARKS=1
+RUN_BENCHMARKS = os.getenv("RUN_BENCHMARKS", "").lower() in ["1", "true", "yes"]
+# seconds a benchmark subprocess may run before it is killed
+TIMEOUT = float(os.getenv("BENCHMARK_TIMEOUT", "300"))
+
+benchmark = unittest.skipUnless(RUN_BENCHMARKS, "set RUN_BENCHMARKS=1 to run")
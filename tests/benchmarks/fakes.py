@@ -0,0 +1,246 @@
+import json
+import time
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl
+
+
+class _FakeServer:
+    """
+    HTTP server on a free local port, served from a background thread.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body are written separately, do not delay the body
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+                with server._lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                try:
+                    server.handle(self, self.path, self.headers, body)
+                except ConnectionError:
+                    # the client gave up, like a long poll cancelled on stop
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def handle(self, request, path, headers, body) -> None:
+        pass
+
+    @staticmethod
+    def send_json(request, payload: Any) -> None:
+        data = json.dumps(payload).encode()
+        request.send_response(200)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+
+class FakeOpenAIServer(_FakeServer):
+    """
+    Chat completions endpoint answering every prompt with `reply`.
+
+    With `tool_call` set, user messages are first answered with a call to
+    that tool and the tool result with the reply. Streamed replies are sent
+    in `chunks` pieces, `chunk_interval` seconds apart.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        reply: str = "This is a benchmark reply.",
+        tool_call: Optional[str] = None,
+        chunks: int = 4,
+        chunk_interval: float = 0.0,
+    ):
+        super().__init__(latency)
+        self.reply = reply
+        self.tool_call = tool_call
+        self.chunks = chunks
+        self.chunk_interval = chunk_interval
+
+    def handle(self, request, path, headers, body) -> None:
+        params = json.loads(body)
+        message = {"role": "assistant", "content": self.reply}
+        if self.tool_call and params["messages"][-1]["role"] == "user":
+            message = {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": f"call_{self.requests}",
+                        "type": "function",
+                        "function": {"name": self.tool_call, "arguments": "{}"},
+                    }
+                ],
+            }
+        if params.get("stream"):
+            self._stream(request, params["model"], message)
+            return
+        self.send_json(
+            request,
+            {
+                "id": f"chatcmpl-{self.requests}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": params["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": message,
+                        "finish_reason": (
+                            "tool_calls" if "tool_calls" in message else "stop"
+                        ),
+                    }
+                ],
+                "usage": self._usage(params),
+            },
+        )
+
+    def _stream(self, request, model: str, message: Dict[str, Any]) -> None:
+        request.send_response(200)
+        request.send_header("Content-Type", "text/event-stream")
+        request.send_header("Transfer-Encoding", "chunked")
+        request.end_headers()
+
+        def send(payload: str) -> None:
+            data = f"data: {payload}\n\n".encode()
+            request.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            request.wfile.flush()
+
+        if "tool_calls" in message:
+            deltas = [{"tool_calls": [dict(message["tool_calls"][0], index=0)]}]
+        else:
+            size = -(-len(self.reply) // self.chunks)
+            deltas = [
+                {"content": self.reply[i : i + size]}
+                for i in range(0, len(self.reply), size)
+            ]
+        for delta in deltas:
+            send(json.dumps(self._chunk(model, [{"index": 0, "delta": delta}])))
+            if self.chunk_interval:
+                time.sleep(self.chunk_interval)
+        usage = self._chunk(model, [])
+        usage["usage"] = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        send(json.dumps(usage))
+        send("[DONE]")
+        request.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, model: str, choices: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "id": f"chatcmpl-{self.requests}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": choices,
+        }
+
+    @staticmethod
+    def _usage(params: Dict[str, Any]) -> Dict[str, int]:
+        prompt = sum(len(m.get("content") or "") // 4 for m in params["messages"])
+        return {
+            "prompt_tokens": prompt,
+            "completion_tokens": 8,
+            "total_tokens": prompt + 8,
+        }
+
+
+class FakeTelegramServer(_FakeServer):
+    """
+    Bot API endpoint recording the methods called and the messages sent, and
+    serving `updates` to `getUpdates` long polls.
+    """
+
+    def __init__(self, latency: float = 0.0, updates: List[Dict[str, Any]] = ()):
+        super().__init__(latency)
+        self.updates = list(updates)
+        self.sent: List[Dict[str, Any]] = []
+        self.edits = 0
+        self.methods: List[str] = []
+        self._message_ids = 0
+
+    def handle(self, request, path, headers, body) -> None:
+        method = path.rsplit("/", 1)[-1]
+        params = self._parse(headers, body)
+        with self._lock:
+            self.methods.append(method)
+        if method == "getUpdates":
+            result = self._get_updates(params)
+        elif method in ("sendMessage", "editMessageText"):
+            result = self._message(method, params)
+        else:
+            result = True
+        self.send_json(request, {"ok": True, "result": result})
+
+    def _message(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            if method == "editMessageText":
+                self.edits += 1
+                message_id = params["message_id"]
+            else:
+                self._message_ids += 1
+                message_id = self._message_ids
+                self.sent.append(dict(params, sent_at=time.perf_counter()))
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": params["chat_id"], "type": "private"},
+            "text": params.get("text", ""),
+        }
+
+    def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = params.get("offset") or 0
+        deadline = time.monotonic() + min(float(params.get("timeout") or 0), 1.0)
+        while True:
+            with self._lock:
+                self.updates = [u for u in self.updates if u["update_id"] >= offset]
+                pending = self.updates[:100]
+            if pending or time.monotonic() >= deadline:
+                return pending
+            time.sleep(0.01)
+
+    @staticmethod
+    def _parse(headers, body: bytes) -> Dict[str, Any]:
+        if headers.get("Content-Type", "").startswith("application/json"):
+            return json.loads(body or b"{}")
+        # form fields hold JSON encoded values
+        params = {}
+        for key, value in parse_qsl(body.decode()):
+            try:
+                params[key] = json.loads(value)
+            except ValueError:
+                params[key] = value
+        return params
@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+import subprocess
+import unittest
+
+from pathlib import Path
+from . import TIMEOUT, benchmark
+from .fakes import FakeOpenAIServer, FakeTelegramServer
+
+SOURCE_DIR = Path(__file__).resolve().parents[2] / "src"
+
+# imports the Lambda module in a fresh interpreter and sends it one update, a
+# private message answered through the fake APIs, or a group message it ignores
+COLD_START_SCRIPT = """
+import json, sys, time
+
+chat_type = sys.argv[1]
+started = time.perf_counter()
+import lambda_function
+imported = time.perf_counter()
+
+update = {
+    "update_id": 1,
+    "message": {
+        "message_id": 1,
+        "date": 0,
+        "chat": {"id": 42 if chat_type == "private" else -100, "type": chat_type},
+        "from": {"id": 42, "is_bot": False, "first_name": "Bench"},
+        "text": "hello",
+    },
+}
+response = lambda_function.lambda_handler({"body": json.dumps(update)}, None)
+handled = time.perf_counter()
+
+print(json.dumps({
+    "import_seconds": imported - started,
+    "first_update_seconds": handled - imported,
+    "status_code": response["statusCode"],
+    "bot_user": lambda_function.bot and lambda_function.bot.application.bot.username,
+    "loaded": [name for name in ("openai", "telegram") if name in sys.modules],
+}))
+"""
+
+
+def measure_cold_start(chat_type="private", **environment):
+    with FakeOpenAIServer() as openai, FakeTelegramServer() as telegram:
+        env = dict(
+            os.environ,
+            PYTHONPATH=str(SOURCE_DIR),
+            BOT_TOKEN="123456:benchmark",
+            BOT_USERNAME="benchmark_bot",
+            GPT_TOKEN="benchmark",
+            OPENAI_BASE_URL=f"{openai.url}/v1",
+            TELEGRAM_API_URL=f"{telegram.url}/bot",
+            **environment,
+        )
+        for name in ("HISTORY_DB_PATH", "UPDATE_QUEUE_PATH", "IDEMPOTENCY_DB_PATH"):
+            env.pop(name, None)
+        output = subprocess.run(
+            [sys.executable, "-c", COLD_START_SCRIPT, chat_type],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=TIMEOUT,
+        ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["telegram_methods"] = telegram.methods
+    return result
+
+
+@benchmark
+class TestColdStartBenchmark(unittest.TestCase):
+    """
+    Import time and first-update latency of the Lambda entry point.
+    """
+
+    def test_lazy_startup(self):
+        result = measure_cold_start(LAZY_STARTUP="1")
+        print(f"\nlazy startup: {result}")
+
+        self.assertEqual(result["status_code"], 200)
+        # the bot identity came from config, not from a getMe call
+        self.assertEqual(result["bot_user"], "benchmark_bot")
+        self.assertNotIn("getMe", result["telegram_methods"])
+        self.assertIn("sendMessage", result["telegram_methods"])
+
+    def test_eager_startup(self):
+        result = measure_cold_start(LAZY_STARTUP="0")
+        print(f"\neager startup: {result}")
+
+        self.assertEqual(result["status_code"], 200)
+        self.assertEqual(result["bot_user"], "benchmark_bot")
+        self.assertNotIn("getMe", result["telegram_methods"])
+        self.assertIn("sendMessage", result["telegram_methods"])
+
+    def test_ignored_update_loads_nothing(self):
+        result = measure_cold_start("group", LAZY_STARTUP="1")
+        print(f"\nignored update: {result}")
+
+        self.assertEqual(result["status_code"], 200)
+        # the update was dropped before the bot was built
+        self.assertIsNone(result["bot_user"])
+        # and needed neither openai nor python-telegram-bot
+        self.assertEqual(result["loaded"], [])
+        self.assertEqual(result["telegram_methods"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
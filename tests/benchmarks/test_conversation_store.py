@@ -0,0 +1,66 @@
+import os
+import tempfile
+import time
+import unittest
+
+from storage import InMemoryConversationStore, SQLiteConversationStore
+from . import benchmark
+
+CHATS = 10_000
+MESSAGES_PER_CHAT = 4
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+@benchmark
+class TestConversationStoreBenchmark(unittest.TestCase):
+    """
+    Load/append latency for the conversation stores at 10k chats.
+    """
+
+    def _benchmark(self, store):
+        message = {"role": "user", "content": "How is the weather today?"}
+
+        appends = []
+        for _ in range(MESSAGES_PER_CHAT):
+            for chat_id in range(CHATS):
+                started = time.perf_counter()
+                store.append(chat_id, [message])
+                appends.append(time.perf_counter() - started)
+        store.flush()
+
+        loads = []
+        for chat_id in range(0, CHATS, 10):
+            started = time.perf_counter()
+            history = store.load(chat_id)
+            loads.append(time.perf_counter() - started)
+            self.assertEqual(len(history), MESSAGES_PER_CHAT)
+
+        print(
+            f"\n{store.__class__.__name__}: "
+            f"append p50={percentile(appends, 0.5) * 1e6:.1f}us "
+            f"p99={percentile(appends, 0.99) * 1e6:.1f}us, "
+            f"load p50={percentile(loads, 0.5) * 1e6:.1f}us "
+            f"p99={percentile(loads, 0.99) * 1e6:.1f}us"
+        )
+        return loads
+
+    def test_in_memory_store(self):
+        loads = self._benchmark(InMemoryConversationStore())
+        self.assertLess(percentile(loads, 0.5), 0.001)
+
+    def test_sqlite_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = SQLiteConversationStore(os.path.join(directory, "history.db"))
+            try:
+                loads = self._benchmark(store)
+            finally:
+                store.close()
+        self.assertLess(percentile(loads, 0.5), 0.005)
+
+
+if __name__ == "__main__":
+    unittest.main()
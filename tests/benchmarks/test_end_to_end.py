@@ -0,0 +1,277 @@
+import os
+import sys
+import json
+import subprocess
+import unittest
+
+from pathlib import Path
+from . import TIMEOUT, benchmark
+from .fakes import FakeOpenAIServer, FakeTelegramServer
+
+SOURCE_DIR = Path(__file__).resolve().parents[2] / "src"
+
+# drives the Lambda entry point, or the long-polling runner, in a fresh
+# interpreter against the fake servers and prints a latency/memory report
+LOAD_SCRIPT = """
+import gc, json, sys, time, asyncio, tracemalloc
+
+config = json.loads(sys.argv[1])
+
+started = time.perf_counter()
+import lambda_function
+imported = time.perf_counter()
+
+
+def make_update(update_id, chat_id):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Bench"},
+            "text": f"question {update_id} from {chat_id}",
+        },
+    }
+
+
+def invoke(body):
+    response = lambda_function.lambda_handler({"body": json.dumps(body)}, None)
+    assert response["statusCode"] == 200, response
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+count, chats, mode = config["updates"], config["chats"], config["mode"]
+latencies = []
+began = time.perf_counter()
+
+if mode == "webhook":
+    for i in range(count):
+        invoked = time.perf_counter()
+        invoke(make_update(i + 1, 1000 + i % chats))
+        latencies.append(time.perf_counter() - invoked)
+
+elif mode == "batch":
+    size = config["batch_size"]
+    for start in range(0, count, size):
+        invoked = time.perf_counter()
+        ids = range(start + 1, min(count, start + size) + 1)
+        invoke([make_update(i, 1000 + i % chats) for i in ids])
+        latencies.append(time.perf_counter() - invoked)
+
+elif mode == "polling":
+    from telegram_bot import LongPollingRunner
+
+    bot = lambda_function.get_bot()
+    handle = bot.handle_update_async
+
+    async def timed_handle(update):
+        received = time.perf_counter()
+        await handle(update)
+        latencies.append(time.perf_counter() - received)
+
+    bot.handle_update_async = timed_handle
+    poller = LongPollingRunner(bot, config["concurrency"], poll_timeout=1)
+
+    async def poll():
+        stop = asyncio.Event()
+        task = asyncio.create_task(poller.run(stop))
+        deadline = time.monotonic() + config["timeout"]
+        try:
+            while poller.processed < count:
+                if task.done() or time.monotonic() > deadline:
+                    raise TimeoutError(f"processed {poller.processed} of {count}")
+                await asyncio.sleep(0.01)
+        finally:
+            stop.set()
+            await asyncio.wait_for(task, 10)
+
+    lambda_function.runner.run(poll())
+
+elapsed = time.perf_counter() - began
+# the first request pays for lazy imports and connections, reported apart
+first_request, warm = latencies[0], latencies[1:] or latencies
+
+# memory held per new chat, after the latency run so tracing does not skew it
+memory_chats = config.get("memory_chats", 0)
+memory_per_1k_chats = None
+if memory_chats:
+    gc.collect()
+    tracemalloc.start()
+    for i in range(memory_chats):
+        invoke(make_update(10**6 + i, 10**6 + i))
+    gc.collect()
+    memory_per_1k_chats = tracemalloc.get_traced_memory()[0] / memory_chats * 1000
+    tracemalloc.stop()
+
+print(json.dumps({
+    "import_seconds": imported - started,
+    "first_request_seconds": first_request,
+    "requests": len(latencies),
+    "p50": percentile(warm, 0.50),
+    "p95": percentile(warm, 0.95),
+    "p99": percentile(warm, 0.99),
+    "updates_per_second": count / elapsed,
+    "memory_per_1k_chats": memory_per_1k_chats,
+}))
+"""
+
+
+def run_load(openai, telegram, environment=None, **config):
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(SOURCE_DIR),
+        BOT_TOKEN="123456:benchmark",
+        BOT_USERNAME="benchmark_bot",
+        GPT_TOKEN="benchmark",
+        OPENAI_BASE_URL=f"{openai.url}/v1",
+        TELEGRAM_API_URL=f"{telegram.url}/bot",
+        # the fake Bot API has no send limits, measure the bot and not them
+        TELEGRAM_CHAT_MESSAGES_PER_SECOND="1000",
+        TELEGRAM_MESSAGES_PER_SECOND="1000",
+        **(environment or {}),
+    )
+    for name in ("HISTORY_DB_PATH", "UPDATE_QUEUE_PATH", "IDEMPOTENCY_DB_PATH"):
+        env.pop(name, None)
+    output = subprocess.run(
+        [sys.executable, "-c", LOAD_SCRIPT, json.dumps(dict(config, timeout=TIMEOUT))],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+        timeout=TIMEOUT,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def report(name, result):
+    memory = result["memory_per_1k_chats"]
+    print(
+        f"\n{name}: "
+        f"p50={result['p50'] * 1000:.1f}ms "
+        f"p95={result['p95'] * 1000:.1f}ms "
+        f"p99={result['p99'] * 1000:.1f}ms, "
+        f"{result['updates_per_second']:.0f} updates/s, "
+        f"cold start {result['import_seconds']:.2f}s + "
+        f"{result['first_request_seconds'] * 1000:.0f}ms"
+        + (f", {memory / 1024:.0f}KiB per 1k chats" if memory else "")
+    )
+
+
+@benchmark
+class TestEndToEndBenchmark(unittest.TestCase):
+    """
+    Latency, throughput, memory and cold start of whole turns, from Telegram
+    update to reply, against local OpenAI and Telegram stand-ins.
+    """
+
+    UPDATES = int(os.getenv("BENCHMARK_UPDATES", "100"))
+    CHATS = int(os.getenv("BENCHMARK_CHATS", "25"))
+    # new chats started while tracing memory, reported per 1k chats
+    MEMORY_CHATS = int(os.getenv("BENCHMARK_MEMORY_CHATS", "200"))
+    # seconds the fake APIs take to answer, roughly a fast real response
+    OPENAI_LATENCY = float(os.getenv("BENCHMARK_OPENAI_LATENCY", "0.02"))
+    TELEGRAM_LATENCY = float(os.getenv("BENCHMARK_TELEGRAM_LATENCY", "0.005"))
+
+    def servers(self, **openai_options):
+        return (
+            FakeOpenAIServer(self.OPENAI_LATENCY, **openai_options),
+            FakeTelegramServer(self.TELEGRAM_LATENCY),
+        )
+
+    def test_webhook(self):
+        openai, telegram = self.servers()
+        with openai, telegram:
+            result = run_load(
+                openai,
+                telegram,
+                mode="webhook",
+                updates=self.UPDATES,
+                chats=self.CHATS,
+                memory_chats=self.MEMORY_CHATS,
+            )
+        report("webhook", result)
+
+        self.assertEqual(len(telegram.sent), self.UPDATES + self.MEMORY_CHATS)
+        self.assertEqual(openai.requests, self.UPDATES + self.MEMORY_CHATS)
+        self.assertLess(result["p99"], 1.0)
+
+    def test_webhook_with_tool_calls(self):
+        openai, telegram = self.servers(tool_call="get_time")
+        with openai, telegram:
+            result = run_load(
+                openai, telegram, mode="webhook", updates=self.UPDATES, chats=self.CHATS
+            )
+        report("webhook with tool calls", result)
+
+        self.assertEqual(len(telegram.sent), self.UPDATES)
+        self.assertEqual(openai.requests, 2 * self.UPDATES)
+
+    def test_streamed_replies(self):
+        openai, telegram = self.servers(chunk_interval=0.005)
+        with openai, telegram:
+            result = run_load(
+                openai,
+                telegram,
+                {"STREAM_REPLIES": "1"},
+                mode="webhook",
+                updates=self.UPDATES,
+                chats=self.CHATS,
+            )
+        report("streamed replies", result)
+
+        # one placeholder per update, edited with the streamed text
+        self.assertEqual(len(telegram.sent), self.UPDATES)
+        self.assertGreaterEqual(telegram.edits, self.UPDATES)
+
+    def test_batches(self):
+        openai, telegram = self.servers()
+        with openai, telegram:
+            result = run_load(
+                openai,
+                telegram,
+                mode="batch",
+                batch_size=50,
+                updates=self.UPDATES,
+                chats=self.CHATS,
+            )
+        report("batches of 50", result)
+
+        self.assertEqual(len(telegram.sent), self.UPDATES)
+
+    def test_long_polling(self):
+        openai, telegram = self.servers()
+        telegram.updates = [
+            {
+                "update_id": update_id,
+                "message": {
+                    "message_id": update_id,
+                    "date": 0,
+                    "chat": {"id": 1000 + update_id % self.CHATS, "type": "private"},
+                    "text": "hello",
+                },
+            }
+            for update_id in range(1, self.UPDATES + 1)
+        ]
+        with openai, telegram:
+            result = run_load(
+                openai,
+                telegram,
+                mode="polling",
+                concurrency=32,
+                updates=self.UPDATES,
+                chats=self.CHATS,
+            )
+        report("long polling", result)
+
+        # messages a chat sends while its last turn runs are answered together
+        self.assertLessEqual(len(telegram.sent), self.UPDATES)
+        self.assertEqual(openai.requests, len(telegram.sent))
+
+
+if __name__ == "__main__":
+    unittest.main()
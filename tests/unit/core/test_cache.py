@@ -0,0 +1,127 @@
+import unittest
+
+from core import ExternalToolsHandler
+from utils import TTLCache, CachedToolsHandler, ResponseCache, WebTools
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingTools(ExternalToolsHandler):
+    def __init__(self):
+        self.tools = []
+        self.calls = 0
+
+    def has_function(self, name):
+        return name in ["fetch", "submit"]
+
+    def call_function(self, name, args):
+        self.calls += 1
+        return f"{name} #{self.calls}"
+
+    def get_cache_ttl(self, name, args):
+        return 10.0 if name == "fetch" else None
+
+
+class TestTTLCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TTLCache(maxsize=2, clock=self.clock)
+
+    def test_entries_expire(self):
+        self.cache.set("a", 1, ttl=5)
+        self.assertEqual(self.cache.get("a"), 1)
+
+        self.clock.now = 5
+        self.assertIs(self.cache.get("a"), TTLCache.MISSING)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.set("a", 1, ttl=5)
+        self.cache.set("b", 2, ttl=5)
+        self.cache.get("a")
+        self.cache.set("c", 3, ttl=5)
+
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIs(self.cache.get("b"), TTLCache.MISSING)
+
+
+class TestCachedToolsHandler(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tools = CountingTools()
+        self.handler = CachedToolsHandler(self.tools)
+
+    async def test_caches_opted_in_calls_by_canonical_args(self):
+        first = await self.handler.call_function_async("fetch", {"a": 1, "b": 2})
+        second = await self.handler.call_function_async("fetch", {"b": 2, "a": 1})
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.tools.calls, 1)
+        self.assertEqual(self.handler.cache.hit_rate, 0.5)
+
+    async def test_does_not_cache_opted_out_calls(self):
+        await self.handler.call_function_async("submit", {})
+        await self.handler.call_function_async("submit", {})
+        self.assertEqual(self.tools.calls, 2)
+        self.assertEqual(len(self.handler.cache), 0)
+
+    def test_web_tools_never_cache_posts(self):
+        web_tools = WebTools()
+        self.assertEqual(
+            web_tools.get_cache_ttl("http_request", {"method": "get"}),
+            WebTools.CACHE_TTL,
+        )
+        self.assertIsNone(web_tools.get_cache_ttl("http_request", {"method": "POST"}))
+        self.assertFalse(
+            web_tools.is_cacheable_result("http_request", "Response: 503, x")
+        )
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_exact_match_ignores_case_spacing_and_punctuation(self):
+        cache = ResponseCache(ttl=10, clock=self.clock)
+        cache.set("model", "What is  the capital of France?", "Paris")
+
+        self.assertEqual(cache.get("model", "what is the capital of france"), "Paris")
+        self.assertIsNone(cache.get("other-model", "What is the capital of France?"))
+        self.assertIsNone(cache.get("model", "What is the capital of Spain?"))
+        self.assertEqual((cache.exact_hits, cache.misses), (1, 2))
+
+    def test_entries_expire(self):
+        cache = ResponseCache(ttl=10, clock=self.clock)
+        cache.set("model", "hello", "hi")
+        self.clock.now += 10
+        self.assertIsNone(cache.get("model", "hello"))
+
+    def test_similar_prompts_share_a_reply(self):
+        cache = ResponseCache(ttl=10, similarity=0.6, clock=self.clock)
+        cache.set("model", "what is the capital of france", "Paris")
+
+        self.assertEqual(cache.get("model", "whats the capital of france"), "Paris")
+        self.assertIsNone(cache.get("model", "what is the capital of germany"))
+        self.assertEqual(cache.similar_hits, 1)
+        self.assertEqual(cache.hit_rate, 0.5)
+
+    def test_similarity_index_follows_evictions(self):
+        cache = ResponseCache(maxsize=2, ttl=10, similarity=0.6, clock=self.clock)
+        cache.set("model", "what is the capital of france", "Paris")
+        cache.set("model", "how tall is the eiffel tower", "330m")
+        cache.set("model", "who painted the mona lisa", "Leonardo")
+
+        self.assertIsNone(cache.get("model", "whats the capital of france"))
+        self.assertEqual(cache.get("model", "who painted mona lisa"), "Leonardo")
+        # only the n-grams of the two cached prompts are indexed
+        indexed = set().union(*cache._index.values())
+        self.assertEqual(len(indexed), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
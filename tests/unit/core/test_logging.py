@@ -0,0 +1,70 @@
+import io
+import json
+import logging
+import unittest
+
+from utils.logging import JSONFormatter, RequestContextFilter, request_id
+
+
+class TestStructuredLogging(unittest.TestCase):
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.handler = logging.StreamHandler(self.stream)
+        self.handler.setFormatter(JSONFormatter(max_message_chars=20))
+        self.handler.addFilter(RequestContextFilter({"noisy": 0.5}))
+        self.logger = logging.getLogger("structured-test")
+        self.logger.addHandler(self.handler)
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+        self.addCleanup(self.logger.removeHandler, self.handler)
+
+    def lines(self):
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_json_lines_with_request_id_and_truncation(self):
+        token = request_id.set("req-1")
+        self.addCleanup(request_id.reset, token)
+
+        self.logger.info("payload: %s", "x" * 100)
+
+        (line,) = self.lines()
+        self.assertEqual(line["level"], "INFO")
+        self.assertEqual(line["logger"], "structured-test")
+        self.assertEqual(line["request_id"], "req-1")
+        self.assertEqual(line["message"], "payload: xxxxxxxxxxx... [89 more chars]")
+
+    def test_disabled_levels_do_not_format_arguments(self):
+        class Payload:
+            def __str__(self):
+                raise AssertionError("formatted")
+
+        self.logger.setLevel(logging.INFO)
+        self.logger.debug("update: %s", Payload())
+        self.assertEqual(self.lines(), [])
+
+    def test_sampling_keeps_all_lines_of_a_sampled_request(self):
+        noisy = logging.getLogger("noisy")
+        noisy.addHandler(self.handler)
+        noisy.setLevel(logging.INFO)
+        noisy.propagate = False
+        self.addCleanup(noisy.removeHandler, self.handler)
+
+        kept = {}
+        for i in range(200):
+            token = request_id.set(f"req-{i}")
+            noisy.info("first")
+            noisy.info("second")
+            noisy.warning("always")
+            request_id.reset(token)
+        for line in self.lines():
+            if line["message"] != "always":
+                kept[line["request_id"]] = kept.get(line["request_id"], 0) + 1
+
+        self.assertEqual(set(kept.values()), {2})
+        self.assertTrue(50 < len(kept) < 150)
+        warnings = [line for line in self.lines() if line["message"] == "always"]
+        self.assertEqual(len(warnings), 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+from utils import TokenBucket, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_allows_bursts_up_to_capacity(self):
+        bucket = TokenBucket(1.0, 3, clock=self.clock)
+        self.assertEqual(
+            [bucket.try_acquire() for _ in range(4)], [True, True, True, False]
+        )
+
+        self.clock.now += 1
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+
+    async def test_acquire_waits_for_refill(self):
+        bucket = TokenBucket.per_minute(60, clock=self.clock, sleep=self.clock.sleep)
+        await bucket.acquire(60)
+        await bucket.acquire(30)
+        self.assertAlmostEqual(self.clock.now, 30.0)
+
+    async def test_oversized_request_waits_for_a_full_bucket(self):
+        bucket = TokenBucket(1.0, 10, clock=self.clock, sleep=self.clock.sleep)
+        bucket.try_acquire(10)
+        await bucket.acquire(25)
+        self.assertAlmostEqual(self.clock.now, 10.0)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(
+            failure_threshold=2, reset_timeout=30, clock=self.clock
+        )
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_lets_one_trial_call_through_when_half_open(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 30
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_trial_reopens_the_circuit(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.clock.now += 29
+        self.assertFalse(self.breaker.allow())
@@ -0,0 +1,50 @@
+import asyncio
+import unittest
+
+from utils import EventLoopRunner
+
+
+class TestEventLoopRunner(unittest.TestCase):
+    def setUp(self):
+        self.runner = EventLoopRunner()
+
+    def tearDown(self):
+        self.runner.close()
+
+    def test_reuses_the_same_loop_across_runs(self):
+        async def current_loop():
+            return asyncio.get_running_loop()
+
+        first = self.runner.run(current_loop())
+        second = self.runner.run(current_loop())
+        self.assertIs(first, second)
+        self.assertFalse(first.is_closed())
+
+    def test_close_runs_shutdown_callbacks_and_closes_loop(self):
+        closed = []
+
+        async def close_client():
+            closed.append(asyncio.get_running_loop())
+
+        self.runner.add_shutdown_callback(close_client)
+        loop = self.runner.loop
+        self.runner.close()
+
+        self.assertEqual(closed, [loop])
+        self.assertTrue(loop.is_closed())
+
+    def test_recreates_loop_after_close(self):
+        loop = self.runner.loop
+        self.runner.close()
+        self.assertIsNot(self.runner.loop, loop)
+
+    def test_falls_back_without_uvloop(self):
+        runner = EventLoopRunner(use_uvloop=True)
+        try:
+            self.assertEqual(runner.run(asyncio.sleep(0, result=1)), 1)
+        finally:
+            runner.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
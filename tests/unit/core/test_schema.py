@@ -0,0 +1,63 @@
+import unittest
+
+from typing import Optional
+from core import function_tool
+from utils import TimeTools, WebTools
+
+
+class TestFunctionTool(unittest.TestCase):
+    def test_generates_schema_from_signature(self):
+        @function_tool("Add numbers.", a="First number.", b="Second number.")
+        def add(a: int, b: Optional[float] = None) -> str:
+            return str(a + (b or 0))
+
+        parameters = add.__function_tool__["function"]["parameters"]
+        self.assertEqual(add.__function_tool__["function"]["name"], "add")
+        self.assertEqual(
+            parameters["properties"],
+            {
+                "a": {"type": "integer", "description": "First number."},
+                "b": {"type": "number", "description": "Second number."},
+            },
+        )
+        self.assertEqual(parameters["required"], ["a", "b"])
+
+    def test_rejects_descriptions_of_unknown_parameters(self):
+        with self.assertRaises(TypeError):
+
+            @function_tool("Broken.", missing="Not a parameter.")
+            def broken(a: str) -> str:
+                return a
+
+    def test_handlers_collect_declared_tools(self):
+        self.assertEqual(
+            TimeTools.TOOLS[0],
+            {
+                "type": "function",
+                "function": {
+                    "name": "get_time",
+                    "description": "Get current time using a specified format.",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "format": {
+                                "type": "string",
+                                "description": "Python format string for the time.",
+                            }
+                        },
+                        "required": ["format"],
+                        "additionalProperties": False,
+                    },
+                    "strict": True,
+                },
+            },
+        )
+        self.assertEqual(set(WebTools.FUNCTIONS), {"http_request"})
+        self.assertEqual(
+            WebTools.TOOLS[0]["function"]["parameters"]["required"],
+            ["method", "url", "headers", "body"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
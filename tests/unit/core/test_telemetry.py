@@ -0,0 +1,74 @@
+import io
+import json
+import unittest
+
+from utils import Metrics, InMemorySink, EMFSink
+
+
+class TestMetrics(unittest.TestCase):
+    def test_disabled_metrics_record_nothing(self):
+        metrics = Metrics()
+        with metrics.span("stage"):
+            metrics.count("events")
+        self.assertIs(metrics.span("stage"), metrics.span("other"))
+
+    def test_spans_record_duration_and_errors(self):
+        sink = InMemorySink()
+        metrics = Metrics(sink)
+
+        with metrics.span("stage", model="gpt"):
+            pass
+        with self.assertRaises(ValueError):
+            with metrics.span("stage", model="gpt"):
+                raise ValueError()
+
+        self.assertEqual(len(sink.values("stage")), 2)
+        self.assertEqual(sink.records[0].unit, "Milliseconds")
+        self.assertEqual(sink.records[0].dimensions, {"model": "gpt"})
+        self.assertEqual(sink.total("stage.errors"), 1)
+
+
+class TestEMFSink(unittest.TestCase):
+    def test_writes_one_line_per_dimension_set(self):
+        stream = io.StringIO()
+        metrics = Metrics(EMFSink("Bot", stream))
+        metrics.count("tokens", 10, model="a")
+        metrics.count("tokens", 5, model="a")
+        metrics.count("tokens", 7, model="b")
+        metrics.record("latency", 12.5, "Milliseconds")
+        metrics.flush()
+
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[0]["tokens"], [10, 5])
+        self.assertEqual(lines[0]["model"], "a")
+        directive = lines[0]["_aws"]["CloudWatchMetrics"][0]
+        self.assertEqual(directive["Namespace"], "Bot")
+        self.assertEqual(directive["Dimensions"], [["model"]])
+        self.assertEqual(directive["Metrics"], [{"Name": "tokens", "Unit": "Count"}])
+        self.assertEqual(lines[2]["_aws"]["CloudWatchMetrics"][0]["Dimensions"], [[]])
+
+        # records are written once
+        metrics.flush()
+        self.assertEqual(len(stream.getvalue().splitlines()), 3)
+
+    def test_splits_metrics_with_more_than_100_values(self):
+        stream = io.StringIO()
+        metrics = Metrics(EMFSink("Bot", stream))
+        for i in range(250):
+            metrics.record("latency", i, "Milliseconds")
+        metrics.count("requests")
+        metrics.flush()
+
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([len(line["latency"]) for line in lines], [100, 100, 50])
+        self.assertEqual(lines[0]["requests"], [1])
+        self.assertNotIn("requests", lines[1])
+        self.assertEqual(
+            [m["Name"] for m in lines[1]["_aws"]["CloudWatchMetrics"][0]["Metrics"]],
+            ["latency"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
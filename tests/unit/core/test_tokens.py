@@ -0,0 +1,41 @@
+import unittest
+
+from core import estimate_tokens, trim_start
+
+
+class TestEstimateTokens(unittest.TestCase):
+    def test_counts_content_and_tool_calls(self):
+        plain = estimate_tokens({"role": "user", "content": "x" * 40})
+        self.assertEqual(plain, 14)
+
+        tool_call = {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {"id": "1", "function": {"name": "get_time", "arguments": "{}"}}
+            ],
+        }
+        self.assertEqual(estimate_tokens(tool_call), 7)
+
+
+class TestTrimStart(unittest.TestCase):
+    def test_keeps_everything_within_budget(self):
+        self.assertEqual(trim_start(["user", "assistant"], [5, 5], 10), 0)
+
+    def test_drops_oldest_messages(self):
+        roles = ["user", "assistant", "user", "assistant"]
+        self.assertEqual(trim_start(roles, [5, 5, 5, 5], 10), 2)
+
+    def test_never_splits_tool_results_from_their_call(self):
+        roles = ["user", "assistant", "tool", "tool", "assistant", "user"]
+        tokens = [5, 5, 50, 50, 5, 5]
+        # cutting in front of a tool result would orphan it
+        self.assertEqual(trim_start(roles, tokens, 100), 4)
+
+    def test_keeps_last_group_even_over_budget(self):
+        roles = ["user", "assistant", "tool"]
+        self.assertEqual(trim_start(roles, [5, 5, 500], 10), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
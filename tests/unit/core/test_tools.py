@@ -1,3 +1,4 @@
+import httpx
 import unittest
 
 from unittest.mock import patch, MagicMock
@@ -32,18 +33,24 @@ class TestTimeTools(unittest.TestCase):
 
 class TestWebTools(unittest.TestCase):
     def setUp(self):
-        self.web_tools = WebTools()
+        self.requests = []
+        self.responses = {}
+        self.web_tools = WebTools(
+            max_result_chars=100, transport=httpx.MockTransport(self._handle)
+        )
+
+    def _handle(self, request):
+        self.requests.append(request)
+        return self.responses[str(request.url)]
 
     def test_has_function(self):
         self.assertTrue(self.web_tools.has_function("http_request"))
         self.assertFalse(self.web_tools.has_function("invalid_function"))
 
-    @patch("utils.tools.requests.get")
-    def test_http_get_request(self, mock_get):
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.text = '{"data": "test"}'
-        mock_get.return_value = mock_response
+    def test_http_get_request(self):
+        self.responses["https://example.com"] = httpx.Response(
+            200, json={"data": "test"}
+        )
 
         result = self.web_tools.call_function(
             "http_request",
@@ -55,34 +62,65 @@ class TestWebTools(unittest.TestCase):
         )
 
         self.assertIn("Response: 200", result)
-        self.assertIn('{"data": "test"}', result)
-        mock_get.assert_called_once_with(
-            "https://example.com", headers={"Content-Type": "application/json"}
-        )
+        self.assertIn('{"data":"test"}', result)
+        self.assertEqual(self.requests[0].method, "GET")
+        self.assertEqual(self.requests[0].headers["content-type"], "application/json")
 
-    @patch("utils.tools.requests.post")
-    def test_http_post_request(self, mock_post):
-        mock_response = MagicMock()
-        mock_response.status_code = 201
-        mock_response.text = '{"status": "created"}'
-        mock_post.return_value = mock_response
+    def test_http_post_request(self):
+        self.responses["https://example.com/create"] = httpx.Response(
+            201, json={"status": "created"}
+        )
 
         result = self.web_tools.call_function(
             "http_request",
             {
                 "method": "POST",
                 "url": "https://example.com/create",
-                "headers": {"Content-Type": "application/json"},
-                "body": {"name": "test"},
+                "headers": '{"Content-Type": "application/json"}',
+                "body": '{"name": "test"}',
             },
         )
 
         self.assertIn("Response: 201", result)
-        self.assertIn('{"status": "created"}', result)
-        mock_post.assert_called_once_with(
-            "https://example.com/create",
-            headers={"Content-Type": "application/json"},
-            json={"name": "test"},
+        self.assertIn('{"status":"created"}', result)
+        self.assertEqual(self.requests[0].method, "POST")
+        self.assertEqual(self.requests[0].content, b'{"name":"test"}')
+
+    def test_html_is_reduced_to_text(self):
+        self.responses["https://example.com"] = httpx.Response(
+            200,
+            headers={"Content-Type": "text/html; charset=utf-8"},
+            text="<html><script>var x;</script><body><h1>Hi</h1>\n<p>there</p></body></html>",
+        )
+
+        result = self.web_tools.call_function(
+            "http_request",
+            {"method": "GET", "url": "https://example.com", "headers": "", "body": ""},
+        )
+        self.assertEqual(result, "Response: 200, Hi there")
+
+    def test_long_responses_are_truncated(self):
+        self.responses["https://example.com"] = httpx.Response(
+            200, headers={"Content-Type": "text/plain"}, text="x" * 10_000
+        )
+
+        result = self.web_tools.call_function(
+            "http_request",
+            {"method": "GET", "url": "https://example.com", "headers": {}},
+        )
+        self.assertTrue(result.endswith("x" * 100 + " ... [truncated]"))
+
+    def test_binary_responses_are_omitted(self):
+        self.responses["https://example.com/logo.png"] = httpx.Response(
+            200, headers={"Content-Type": "image/png"}, content=b"\x89PNG" * 10
+        )
+
+        result = self.web_tools.call_function(
+            "http_request",
+            {"method": "GET", "url": "https://example.com/logo.png", "headers": {}},
+        )
+        self.assertEqual(
+            result, "Response: 200, [40 bytes of image/png content omitted]"
         )
 
     def test_unsupported_http_method(self):
@@ -0,0 +1,75 @@
+import unittest
+
+from storage import InMemoryConversationStore, InMemoryUpdateQueue
+
+
+class TestInMemoryConversationStore(unittest.TestCase):
+    def setUp(self):
+        self.store = InMemoryConversationStore(max_chats=3)
+
+    def test_histories_are_isolated_per_chat(self):
+        self.store.append(1, [{"role": "user", "content": "hello"}])
+        self.store.append(2, [{"role": "user", "content": "bonjour"}])
+
+        self.assertEqual(self.store.load(1), [{"role": "user", "content": "hello"}])
+        self.assertEqual(self.store.load(2), [{"role": "user", "content": "bonjour"}])
+        self.assertEqual(self.store.load(3), [])
+
+    def test_load_returns_a_copy(self):
+        self.store.append(1, [{"role": "user", "content": "hello"}])
+        self.store.load(1).append({"role": "user", "content": "leak"})
+        self.assertEqual(len(self.store.load(1)), 1)
+
+    def test_evicts_least_recently_used_chat(self):
+        for chat_id in (1, 2, 3):
+            self.store.append(chat_id, [{"role": "user", "content": "hi"}])
+        # touch chat 1 so chat 2 becomes the least recently used
+        self.store.load(1)
+        self.store.append(4, [{"role": "user", "content": "hi"}])
+
+        self.assertEqual(len(self.store), 3)
+        self.assertIn(1, self.store)
+        self.assertNotIn(2, self.store)
+
+    def test_evicts_by_total_bytes(self):
+        store = InMemoryConversationStore(max_bytes=200)
+        for chat_id in range(10):
+            store.append(chat_id, [{"role": "user", "content": "x" * 50}])
+
+        self.assertLessEqual(store.total_bytes, 200)
+        self.assertIn(9, store)
+        self.assertNotIn(0, store)
+
+    def test_replace_and_clear_track_bytes(self):
+        self.store.append(1, [{"role": "user", "content": "a" * 100}])
+        self.store.replace(1, [{"role": "user", "content": "b"}])
+        self.assertEqual(self.store.load(1), [{"role": "user", "content": "b"}])
+
+        self.store.clear(1)
+        self.assertEqual(self.store.total_bytes, 0)
+        self.assertNotIn(1, self.store)
+
+    def test_trim_keeps_running_token_count(self):
+        self.store.append(1, [{"role": "user", "content": "x" * 40}] * 3)
+        self.assertEqual(self.store.token_count(1), 42)
+
+        self.assertEqual(self.store.trim(1, 30), 1)
+        self.assertEqual(self.store.token_count(1), 28)
+        self.assertEqual(len(self.store.load(1)), 2)
+
+
+class TestInMemoryUpdateQueue(unittest.IsolatedAsyncioTestCase):
+    async def test_put_get_ack(self):
+        queue = InMemoryUpdateQueue()
+        await queue.put({"update_id": 1})
+        await queue.put({"update_id": 2})
+
+        self.assertEqual(await queue.get(0), {"update_id": 1})
+        await queue.ack({"update_id": 1})
+        self.assertEqual(await queue.get(0.01), {"update_id": 2})
+        self.assertIsNone(await queue.get(0))
+        self.assertIsNone(await queue.get(0.01))
+
+
+if __name__ == "__main__":
+    unittest.main()
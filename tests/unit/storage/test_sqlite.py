@@ -0,0 +1,144 @@
+import os
+import tempfile
+import unittest
+
+from storage import SQLiteConversationStore, SQLiteUpdateQueue, SQLiteIdempotencyStore
+
+
+class TestSQLiteConversationStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "history.db")
+        self.store = SQLiteConversationStore(self.path, batch_size=4)
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_history_survives_reopening(self):
+        self.store.append(1, [{"role": "user", "content": "hello"}])
+        self.store.append(2, [{"role": "user", "content": "bonjour"}])
+        self.store.close()
+
+        self.store = SQLiteConversationStore(self.path)
+        self.assertEqual(self.store.load(1), [{"role": "user", "content": "hello"}])
+        self.assertEqual(self.store.load(2), [{"role": "user", "content": "bonjour"}])
+
+    def test_uses_write_ahead_log(self):
+        mode = self.store._connection.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def test_writes_are_batched(self):
+        self.store.append(1, [{"role": "user", "content": "a"}])
+        count = "SELECT COUNT(*) FROM messages"
+        self.assertEqual(self.store._connection.execute(count).fetchone()[0], 0)
+
+        self.store.append(1, [{"role": "user", "content": str(i)} for i in range(3)])
+        self.assertEqual(self.store._connection.execute(count).fetchone()[0], 4)
+
+    def test_replace_and_clear(self):
+        self.store.append(1, [{"role": "user", "content": "old"}])
+        self.store.replace(1, [{"role": "user", "content": "new"}])
+        self.assertEqual(self.store.load(1), [{"role": "user", "content": "new"}])
+
+        self.store.clear(1)
+        self.assertEqual(self.store.load(1), [])
+        self.store.append(1, [{"role": "user", "content": "again"}])
+        self.assertEqual(self.store.load(1), [{"role": "user", "content": "again"}])
+
+    def test_compact_removes_hidden_messages(self):
+        self.store.append(1, [{"role": "user", "content": "old"}])
+        self.store.replace(1, [{"role": "user", "content": "new"}])
+        self.store.flush()
+
+        self.assertEqual(self.store.compact(), 1)
+        self.assertEqual(self.store.load(1), [{"role": "user", "content": "new"}])
+
+    def test_hidden_messages_are_compacted_as_heads_move(self):
+        self.store.COMPACT_INTERVAL = 10
+        for i in range(100):
+            self.store.replace(1, [{"role": "system", "content": f"summary {i}"}])
+            self.store.append(1, [{"role": "user", "content": "x"}] * 3)
+        self.store.flush()
+
+        count = "SELECT COUNT(*) FROM messages"
+        self.assertLessEqual(self.store._connection.execute(count).fetchone()[0], 40)
+        self.assertEqual(len(self.store.load(1)), 4)
+
+    def test_trim_moves_head_past_oldest_messages(self):
+        self.store.append(1, [{"role": "user", "content": "x" * 40}] * 3)
+        self.assertEqual(self.store.token_count(1), 42)
+
+        self.assertEqual(self.store.trim(1, 30), 1)
+        self.assertEqual(self.store.token_count(1), 28)
+        self.assertEqual(len(self.store.load(1)), 2)
+
+
+class TestSQLiteUpdateQueue(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "updates.db")
+        self.queue = SQLiteUpdateQueue(self.path, visibility_timeout=60)
+
+    def tearDown(self):
+        self.queue.close()
+        self.directory.cleanup()
+
+    async def test_updates_are_queued_once_in_order(self):
+        await self.queue.put({"update_id": 2, "message": {}})
+        await self.queue.put({"update_id": 1, "message": {}})
+        await self.queue.put({"update_id": 1, "message": {}})
+        self.assertEqual(len(self.queue), 2)
+
+        self.assertEqual((await self.queue.get(0))["update_id"], 1)
+        self.assertEqual((await self.queue.get(0))["update_id"], 2)
+        self.assertIsNone(await self.queue.get(0))
+
+    async def test_unacknowledged_updates_become_visible_again(self):
+        await self.queue.put({"update_id": 1})
+        update = await self.queue.get(0)
+
+        self.queue.visibility_timeout = 0
+        self.assertEqual(await self.queue.get(0), update)
+
+        await self.queue.ack(update)
+        self.assertIsNone(await self.queue.get(0))
+        self.assertEqual(len(self.queue), 0)
+
+    async def test_queue_is_shared_through_the_file(self):
+        await self.queue.put({"update_id": 1})
+        other = SQLiteUpdateQueue(self.path)
+        try:
+            self.assertEqual(await other.get(0), {"update_id": 1})
+        finally:
+            other.close()
+
+
+class TestSQLiteIdempotencyStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "seen.db")
+        self.store = SQLiteIdempotencyStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_keys_are_recorded_until_they_expire(self):
+        self.assertTrue(self.store.add(1, ttl=60))
+        self.assertFalse(self.store.add(1, ttl=60))
+
+        self.assertTrue(self.store.add(2, ttl=0))
+        self.assertTrue(self.store.add(2, ttl=60))
+
+    def test_keys_are_shared_through_the_file(self):
+        self.store.add(1, ttl=60)
+        other = SQLiteIdempotencyStore(self.path)
+        try:
+            self.assertFalse(other.add(1, ttl=60))
+        finally:
+            other.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+from unittest.mock import AsyncMock, MagicMock
+from core import IdempotencyStore
+from telegram_bot import FohlFehBot, UpdateDeduplicator
+
+
+class SharedStore(IdempotencyStore):
+    def __init__(self):
+        self.keys = set()
+
+    def add(self, key, ttl):
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        return True
+
+
+class TestUpdateDeduplicator(unittest.TestCase):
+    def test_detects_repeated_update_ids(self):
+        deduplicator = UpdateDeduplicator()
+        self.assertFalse(deduplicator.is_duplicate(1))
+        self.assertTrue(deduplicator.is_duplicate(1))
+        self.assertFalse(deduplicator.is_duplicate(2))
+        self.assertEqual(deduplicator.duplicates, 1)
+
+    def test_consults_the_shared_store(self):
+        store = SharedStore()
+        # another container already handled update 1
+        UpdateDeduplicator(store).is_duplicate(1)
+
+        deduplicator = UpdateDeduplicator(store)
+        self.assertTrue(deduplicator.is_duplicate(1))
+        self.assertFalse(deduplicator.is_duplicate(2))
+
+
+class TestFohlFehBotDeduplication(unittest.IsolatedAsyncioTestCase):
+    async def test_duplicate_updates_are_not_processed(self):
+        bot = FohlFehBot("123:test-token", "test_bot", UpdateDeduplicator())
+        bot.application_initialized = True
+        bot.application = MagicMock()
+        bot.application.process_update = AsyncMock()
+
+        update = MagicMock(update_id=7)
+        await bot.handle_update_async(update)
+        await bot.handle_update_async(update)
+
+        bot.application.process_update.assert_awaited_once_with(update)
+
+
+if __name__ == "__main__":
+    unittest.main()
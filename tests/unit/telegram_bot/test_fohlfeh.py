@@ -0,0 +1,138 @@
+import asyncio
+import unittest
+
+from unittest.mock import AsyncMock, MagicMock, patch
+from telegram_bot import FohlFehBot
+
+
+async def make_chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+class TestFohlFehBotInitialize(unittest.IsolatedAsyncioTestCase):
+    async def test_known_bot_identity_skips_get_me(self):
+        bot = FohlFehBot("123:test-token", "test_bot")
+        extbot_class = type(bot.application.bot)
+        with patch.object(extbot_class, "get_me", AsyncMock()) as get_me:
+            await bot.initialize()
+            get_me.assert_not_awaited()
+        self.assertEqual(bot.application.bot.username, "test_bot")
+        await bot.shutdown()
+
+    async def test_falls_back_to_get_me_without_bot_internals(self):
+        with patch.object(FohlFehBot, "BOT_INTERNALS", ("_missing",)):
+            bot = FohlFehBot("123:test-token", "test_bot")
+        extbot_class = type(bot.application.bot)
+        with patch.object(extbot_class, "get_me", AsyncMock()) as get_me:
+            await bot.initialize()
+            get_me.assert_awaited_once()
+        await bot.shutdown()
+
+
+class TestFohlFehBotStreaming(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.bot = FohlFehBot("123:test-token")
+        self.reply = MagicMock()
+        self.reply.edit_text = AsyncMock()
+        self.reply.delete = AsyncMock()
+        self.update = MagicMock()
+        self.update.message.reply_text = AsyncMock(return_value=self.reply)
+
+    async def test_sends_placeholder_and_coalesces_edits(self):
+        self.bot.EDIT_INTERVAL = 60
+
+        await self.bot._reply_streaming(self.update, make_chunks("Hel", "lo", " world"))
+
+        self.update.message.reply_text.assert_awaited_once_with(
+            FohlFehBot.PLACEHOLDER_TEXT
+        )
+        # the first chunk is shown immediately, the rest in one final edit
+        self.assertEqual(
+            [call.args[0] for call in self.reply.edit_text.await_args_list],
+            ["Hel", "Hello world"],
+        )
+
+    async def test_long_reply_continues_in_new_messages(self):
+        self.bot.EDIT_INTERVAL = 60
+
+        await self.bot._reply_streaming(
+            self.update, make_chunks("a" * 4000, "\n", "b" * 100)
+        )
+
+        self.assertEqual(self.reply.edit_text.await_args_list[-1].args[0], "a" * 4000)
+        self.update.message.reply_text.assert_awaited_with("b" * 100)
+
+    async def test_deletes_placeholder_when_nothing_was_streamed(self):
+        await self.bot._reply_streaming(self.update, make_chunks())
+        self.reply.delete.assert_awaited_once()
+        self.reply.edit_text.assert_not_awaited()
+
+
+def make_private_update(text):
+    update = MagicMock()
+    update.effective_chat.id = 1
+    update.effective_chat.type = "private"
+    update.message.text = text
+    update.message.reply_text = AsyncMock()
+    return update
+
+
+class TestFohlFehBotScheduling(unittest.IsolatedAsyncioTestCase):
+    async def test_burst_of_messages_is_answered_in_one_turn(self):
+        bot = FohlFehBot("123:test-token")
+        received = []
+
+        async def handler(message):
+            received.append(message.text)
+            await asyncio.sleep(0.01)
+            return f"reply to {message.text!r}"
+
+        bot.add_private_message_handler(handler)
+        updates = [make_private_update(text) for text in ["hi", "are you", "there?"]]
+        await asyncio.gather(
+            *(bot._on_private_message(update, None) for update in updates)
+        )
+
+        self.assertEqual(received, ["hi", "are you\nthere?"])
+        updates[1].message.reply_text.assert_not_awaited()
+        updates[2].message.reply_text.assert_awaited_once_with(
+            "reply to 'are you\\nthere?'"
+        )
+
+    async def test_failed_handler_sends_nothing(self):
+        bot = FohlFehBot("123:test-token")
+
+        async def handler(message):
+            return None
+
+        bot.add_private_message_handler(handler)
+        update = make_private_update("hi")
+        await bot._on_private_message(update, None)
+
+        update.message.reply_text.assert_not_awaited()
+
+
+class TestFohlFehBotBatches(unittest.IsolatedAsyncioTestCase):
+    async def test_chats_run_concurrently_and_each_chat_in_order(self):
+        bot = FohlFehBot("123:test-token")
+        bot.application_initialized = True
+        handled = []
+
+        async def handle(update):
+            await asyncio.sleep(0.01 if update.update_id == 1 else 0)
+            handled.append(update.update_id)
+
+        bot.handle_update_async = handle
+        updates = [
+            MagicMock(update_id=update_id, effective_chat=MagicMock(id=chat_id))
+            for update_id, chat_id in [(1, "a"), (2, "b"), (3, "a"), (4, "b")]
+        ]
+        await bot.handle_updates_async(updates)
+
+        # chat "b" is not held up by the slow first update of chat "a"
+        self.assertEqual(handled, [2, 4, 1, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+
+from telegram_bot import FohlFehBot, LambdaRequestParser, TelegramMessage
+from telegram_bot import accepts_update
+
+
+def make_body(update_id, chat_id=1, text="hello"):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "text": text,
+        },
+    }
+
+
+class TestLambdaRequestParser(unittest.TestCase):
+    def setUp(self):
+        self.parser = LambdaRequestParser(FohlFehBot("123:test-token").application)
+
+    def test_parse(self):
+        update = self.parser.parse(make_body(5))
+        self.assertEqual(update.update_id, 5)
+        self.assertEqual(update.message.text, "hello")
+        self.assertIsNone(self.parser.parse({"unexpected": True}))
+
+    def test_parse_batch_drops_invalid_bodies_and_orders_updates(self):
+        updates = self.parser.parse_batch(
+            [make_body(3), {"unexpected": True}, "garbage", make_body(1)]
+        )
+        self.assertEqual([update.update_id for update in updates], [1, 3])
+
+    def test_parse_batch_drops_updates_the_bot_ignores(self):
+        group = make_body(2)
+        group["message"]["chat"]["type"] = "group"
+        updates = self.parser.parse_batch(
+            [make_body(1), group, make_body(3, text="/start")]
+        )
+        self.assertEqual([update.update_id for update in updates], [1])
+
+    def test_parse_batch_drops_malformed_updates(self):
+        malformed = make_body(2)
+        del malformed["message"]["date"]
+        with self.assertLogs("LambdaRequestParser", "ERROR"):
+            updates = self.parser.parse_batch([malformed, make_body(1)])
+        self.assertEqual([update.update_id for update in updates], [1])
+
+    def test_accepts_private_text_messages(self):
+        self.assertTrue(accepts_update(make_body(1)))
+
+    def test_rejects_irrelevant_updates(self):
+        edited = {"update_id": 1, "edited_message": make_body(1)["message"]}
+        channel = {"update_id": 1, "channel_post": make_body(1)["message"]}
+        group = make_body(1)
+        group["message"]["chat"]["type"] = "supergroup"
+        photo = make_body(1)
+        del photo["message"]["text"]
+        photo["message"]["photo"] = []
+        for body in (
+            edited,
+            channel,
+            group,
+            photo,
+            make_body(1, text="/start"),
+            {"update_id": "1", "message": make_body(1)["message"]},
+            {"unexpected": True},
+            "garbage",
+        ):
+            with self.subTest(body=body):
+                self.assertFalse(accepts_update(body))
+
+
+class TestTelegramMessage(unittest.TestCase):
+    def test_from_update(self):
+        parser = LambdaRequestParser(FohlFehBot("123:test-token").application)
+        body = make_body(1, chat_id=7)
+        body["message"]["from"] = {
+            "id": 42,
+            "is_bot": False,
+            "first_name": "Ada",
+            "username": "ada",
+        }
+        message = TelegramMessage.from_update(parser.parse(body))
+
+        self.assertEqual(
+            message,
+            TelegramMessage(
+                chatid=7,
+                chat_type="private",
+                text="hello",
+                userid=42,
+                username="ada",
+                user_fullname="Ada",
+            ),
+        )
+        self.assertTrue(message.is_private_chat)
+        self.assertFalse(message.is_group_chat)
+        self.assertFalse(hasattr(message, "__dict__"))
+
+
+if __name__ == "__main__":
+    unittest.main()
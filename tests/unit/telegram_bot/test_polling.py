@@ -0,0 +1,112 @@
+import asyncio
+import unittest
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+from telegram import Update
+from telegram.error import NetworkError
+from telegram_bot import FohlFehBot, LongPollingRunner
+
+
+def make_update(bot, update_id):
+    return Update.de_json(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 0,
+                "chat": {"id": update_id, "type": "private"},
+                "text": "hello",
+            },
+        },
+        bot.application.bot,
+    )
+
+
+class FakeTelegram:
+    """
+    Serves the given update batches from `getUpdates`, then long-polls forever.
+    """
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.offsets = []
+
+    async def get_updates(self, offset=None, timeout=None, allowed_updates=None):
+        self.offsets.append(offset)
+        if self.batches:
+            batch = self.batches.pop(0)
+            if isinstance(batch, Exception):
+                raise batch
+            return batch
+        if timeout:
+            await asyncio.sleep(3600)
+        return ()
+
+
+class TestLongPollingRunner(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.bot = FohlFehBot("123:test-token", "test_bot")
+        self.bot.initialize = AsyncMock()
+        self.handled = []
+        self.done = asyncio.Event()
+
+        async def handle(update):
+            self.handled.append(update.update_id)
+            if len(self.handled) == 3:
+                self.done.set()
+
+        self.bot.handle_update_async = handle
+
+    def serve(self, batches):
+        telegram = FakeTelegram(batches)
+        self.bot.application = SimpleNamespace(bot=telegram)
+        return telegram
+
+    async def run_until_done(self, runner):
+        stop = asyncio.Event()
+        task = asyncio.create_task(runner.run(stop))
+        await asyncio.wait_for(self.done.wait(), 1)
+        stop.set()
+        await asyncio.wait_for(task, 1)
+
+    async def test_processes_updates_and_confirms_offset(self):
+        updates = [make_update(self.bot, update_id) for update_id in (10, 11, 12)]
+        telegram = self.serve([updates[:2], updates[2:]])
+        runner = LongPollingRunner(self.bot, poll_timeout=30)
+
+        await self.run_until_done(runner)
+
+        self.assertEqual(sorted(self.handled), [10, 11, 12])
+        self.assertEqual(runner.processed, 3)
+        self.assertEqual(telegram.offsets[:3], [None, 12, 13])
+        # the last request acknowledges everything handled before stopping
+        self.assertEqual(telegram.offsets[-1], 13)
+
+    async def test_retries_after_network_error(self):
+        updates = [make_update(self.bot, update_id) for update_id in (1, 2, 3)]
+        self.serve([NetworkError("boom"), updates])
+        runner = LongPollingRunner(self.bot)
+        runner.ERROR_BACKOFF = 0
+
+        await self.run_until_done(runner)
+        self.assertEqual(sorted(self.handled), [1, 2, 3])
+
+    async def test_limits_concurrent_updates(self):
+        active = []
+        peak = []
+
+        async def handle(update):
+            active.append(update)
+            peak.append(len(active))
+            await asyncio.sleep(0.01)
+            active.remove(update)
+            self.handled.append(update.update_id)
+            if len(self.handled) == 3:
+                self.done.set()
+
+        self.bot.handle_update_async = handle
+        self.serve([[make_update(self.bot, update_id) for update_id in (1, 2, 3)]])
+
+        await self.run_until_done(LongPollingRunner(self.bot, concurrency=2))
+        self.assertEqual(max(peak), 2)
@@ -0,0 +1,58 @@
+import asyncio
+import unittest
+
+from telegram_bot import ChatScheduler
+
+
+class TestChatScheduler(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.batches = []
+        self.active = 0
+        self.peak = 0
+
+    async def process(self, batch):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        self.batches.append(batch)
+        await asyncio.sleep(0.02)
+        self.active -= 1
+
+    async def test_serializes_and_coalesces_messages_of_one_chat(self):
+        scheduler = ChatScheduler()
+        results = await asyncio.gather(
+            *(scheduler.run(1, text, self.process) for text in "abc")
+        )
+
+        # "a" runs alone, "b" and "c" arrive meanwhile and form one batch
+        self.assertEqual(self.batches, [["a"], ["b", "c"]])
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(self.peak, 1)
+
+    async def test_bounds_concurrency_across_chats(self):
+        scheduler = ChatScheduler(max_concurrency=2)
+        await asyncio.gather(
+            *(scheduler.run(chat_id, chat_id, self.process) for chat_id in range(6))
+        )
+
+        self.assertEqual(len(self.batches), 6)
+        self.assertEqual(self.peak, 2)
+
+    async def test_idle_chats_are_cleaned_up(self):
+        scheduler = ChatScheduler()
+        await asyncio.gather(
+            *(scheduler.run(chat_id, chat_id, self.process) for chat_id in range(3))
+        )
+        self.assertEqual(len(scheduler), 0)
+
+    async def test_coalesce_window_groups_a_burst(self):
+        scheduler = ChatScheduler(coalesce_window=0.01)
+        first = asyncio.create_task(scheduler.run(1, "a", self.process))
+        await asyncio.sleep(0)
+        await scheduler.run(1, "b", self.process)
+        await first
+
+        self.assertEqual(self.batches, [["a", "b"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import asyncio
+import unittest
+
+from unittest.mock import AsyncMock, MagicMock
+from telegram.error import RetryAfter
+from telegram_bot import OutboundSender
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+
+
+def make_message(chat_id=1):
+    message = MagicMock()
+    message.chat_id = chat_id
+    message.reply_text = AsyncMock(side_effect=lambda text: text)
+    message.edit_text = AsyncMock()
+    return message
+
+
+class TestOutboundSender(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.sender = OutboundSender(
+            chat_rate=1.0,
+            chat_burst=2,
+            global_rate=3.0,
+            clock=self.clock,
+            sleep=self.clock.sleep,
+        )
+
+    async def test_chat_sends_are_limited_after_a_burst(self):
+        message = make_message()
+        for text in ["a", "b", "c", "d"]:
+            await self.sender.reply(message, text)
+        # two go out at once, then one per second
+        self.assertAlmostEqual(self.clock.now, 2.0)
+
+    async def test_all_chats_share_the_global_limit(self):
+        for chat_id in range(6):
+            await self.sender.reply(make_message(chat_id), "hello")
+        self.assertAlmostEqual(self.clock.now, 1.0)
+
+    async def test_long_replies_are_split(self):
+        message = make_message()
+        text = "\n".join(["x" * 3000, "y" * 3000, "z" * 10])
+        sent = await self.sender.reply(message, text)
+        self.assertEqual(sent, ["x" * 3000, "y" * 3000 + "\n" + "z" * 10])
+
+    async def test_retries_after_the_delay_telegram_asks_for(self):
+        message = make_message()
+        message.reply_text.side_effect = [RetryAfter(5), "sent"]
+
+        self.assertEqual(await self.sender.reply(message, "hello"), ["sent"])
+        self.assertGreaterEqual(self.clock.now, 5)
+        self.assertEqual(message.reply_text.await_count, 2)
+
+    async def test_gives_up_after_max_retries(self):
+        sender = OutboundSender(max_retries=1, clock=self.clock, sleep=self.clock.sleep)
+        message = make_message()
+        message.reply_text.side_effect = RetryAfter(1)
+
+        with self.assertRaises(RetryAfter):
+            await sender.reply(message, "hello")
+        self.assertEqual(message.reply_text.await_count, 2)
+
+    async def test_typing_is_shown_until_the_block_exits(self):
+        chat = MagicMock()
+        chat.send_action = AsyncMock()
+        async with self.sender.typing(chat):
+            await asyncio.sleep(0)
+        chat.send_action.assert_awaited_once_with("typing")
+
+        await asyncio.sleep(0)
+        chat.send_action.assert_awaited_once()
+
+
+class TestSplit(unittest.TestCase):
+    def test_short_text_is_one_message(self):
+        self.assertEqual(OutboundSender.split("hello"), ["hello"])
+        self.assertEqual(OutboundSender.split(" "), [])
+
+    def test_prefers_paragraphs_then_lines_then_words(self):
+        self.assertEqual(
+            OutboundSender.split("one two\nthree\n\nfour", 13),
+            ["one two\nthree", "four"],
+        )
+        self.assertEqual(
+            OutboundSender.split("one two\nthree", 10), ["one two", "three"]
+        )
+        self.assertEqual(
+            OutboundSender.split("one two three", 10), ["one two", "three"]
+        )
+
+    def test_cuts_words_longer_than_a_message(self):
+        self.assertEqual(OutboundSender.split("abcdefghij", 4), ["abcd", "efgh", "ij"])
+
+
+if __name__ == "__main__":
+    unittest.main()
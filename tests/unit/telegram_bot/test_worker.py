@@ -0,0 +1,72 @@
+import asyncio
+import unittest
+
+from unittest.mock import AsyncMock
+from storage import InMemoryUpdateQueue
+from telegram_bot import FohlFehBot, UpdateWorker
+
+
+def make_update(update_id):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": 1, "type": "private"},
+            "text": "hello",
+        },
+    }
+
+
+class TestUpdateWorker(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.bot = FohlFehBot("123:test-token")
+        self.bot.handle_update_async = AsyncMock()
+        self.queue = InMemoryUpdateQueue()
+
+    async def test_drain_processes_all_queued_updates(self):
+        for update_id in range(5):
+            await self.queue.put(make_update(update_id))
+
+        worker = UpdateWorker(self.bot, self.queue, concurrency=2)
+        self.assertEqual(await worker.drain(), 5)
+
+        processed = [
+            call.args[0].update_id
+            for call in self.bot.handle_update_async.await_args_list
+        ]
+        self.assertEqual(sorted(processed), list(range(5)))
+        self.assertEqual(len(self.queue), 0)
+
+    async def test_updates_are_processed_concurrently(self):
+        active = []
+        peak = []
+
+        async def handle(update):
+            active.append(update)
+            peak.append(len(active))
+            await asyncio.sleep(0.01)
+            active.remove(update)
+
+        self.bot.handle_update_async = handle
+        for update_id in range(6):
+            await self.queue.put(make_update(update_id))
+
+        await UpdateWorker(self.bot, self.queue, concurrency=3).drain()
+        self.assertEqual(max(peak), 3)
+
+    async def test_run_until_stopped(self):
+        stop = asyncio.Event()
+        worker = UpdateWorker(self.bot, self.queue, concurrency=2, poll_timeout=0.01)
+        task = asyncio.create_task(worker.run(stop))
+
+        await self.queue.put(make_update(1))
+        await asyncio.sleep(0.05)
+        stop.set()
+        await task
+
+        self.assertEqual(worker.processed, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import httpx
+import openai
+
+from types import SimpleNamespace
+
+# the endpoint the fake errors are raised for
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def make_response(content=None, tool_calls=None):
+    message = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def make_error(status, headers=None):
+    response = httpx.Response(status, headers=headers, request=REQUEST)
+    return openai.APIStatusError("failed", response=response, body=None)
+
+
+def make_timeout():
+    return openai.APITimeoutError(request=REQUEST)
+
+
+def make_client(create):
+    """
+    OpenAI client stand-in whose chat completions are made by `create`.
+    """
+    return SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
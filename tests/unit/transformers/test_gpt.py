@@ -0,0 +1,349 @@
+import asyncio
+import time
+import hashlib
+import unittest
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from core import ExternalToolsHandler, function_tool
+from transformers import OpenAIChatBot
+from utils import ResponseCache, InMemorySink, metrics
+from .helpers import make_client, make_response, make_timeout
+
+
+def make_tool_call(call_id, name, arguments="{}"):
+    return SimpleNamespace(
+        id=call_id, function=SimpleNamespace(name=name, arguments=arguments)
+    )
+
+
+class SleepyTools(ExternalToolsHandler):
+    TIMEOUT = 0.5
+
+    @function_tool("Sleep for a moment.")
+    def nap(self) -> str:
+        time.sleep(0.2)
+        return "nap done"
+
+    @function_tool("Sleep for too long.")
+    def oversleep(self) -> str:
+        time.sleep(1)
+        return "oversleep done"
+
+
+def make_chunk(content=None, tool_calls=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+def make_tool_call_fragment(index, call_id=None, name=None, arguments=None):
+    return SimpleNamespace(
+        index=index,
+        id=call_id,
+        function=SimpleNamespace(name=name, arguments=arguments),
+    )
+
+
+async def make_stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+class TestOpenAIChatBot(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.bot = OpenAIChatBot("test-key")
+        self.create = AsyncMock()
+        self.bot.client = make_client(self.create)
+
+    async def test_histories_do_not_cross_chats(self):
+        self.create.side_effect = [make_response("hi alice"), make_response("hi bob")]
+
+        self.assertEqual(await self.bot.send_message(1, "I am alice"), "hi alice")
+        self.assertEqual(await self.bot.send_message(2, "I am bob"), "hi bob")
+
+        messages = self.create.call_args.kwargs["messages"]
+        self.assertEqual(messages[0]["role"], "system")
+        self.assertEqual([m["content"] for m in messages[1:]], ["I am bob"])
+        self.assertEqual(len(self.bot.store.load(1)), 2)
+
+    async def test_clear_history_only_affects_calling_chat(self):
+        self.bot.store.append(2, [{"role": "user", "content": "keep me"}])
+        tool_call = make_tool_call("call_1", "clear_history")
+        self.create.side_effect = [
+            make_response(tool_calls=[tool_call]),
+            make_response("done"),
+        ]
+        self.bot.store.append(1, [{"role": "user", "content": "old"}])
+
+        self.assertEqual(await self.bot.send_message(1, "forget it"), "done")
+
+        history = self.bot.store.load(1)
+        self.assertEqual(history[0]["tool_calls"][0]["id"], "call_1")
+        self.assertEqual(history[1]["role"], "tool")
+        self.assertEqual(self.bot.store.load(2)[0]["content"], "keep me")
+
+    async def test_tool_calls_of_one_turn_run_concurrently(self):
+        self.bot.register_external_tools(SleepyTools())
+        tool_calls = [make_tool_call(f"call_{i}", "nap") for i in range(3)]
+        self.create.side_effect = [
+            make_response(tool_calls=tool_calls),
+            make_response("rested"),
+        ]
+
+        started = time.perf_counter()
+        self.assertEqual(await self.bot.send_message(1, "sleep"), "rested")
+        self.assertLess(time.perf_counter() - started, 0.5)
+
+        results = [m for m in self.bot.store.load(1) if m["role"] == "tool"]
+        self.assertEqual({m["content"] for m in results}, {"nap done"})
+        self.assertEqual(
+            [m["tool_call_id"] for m in results], ["call_0", "call_1", "call_2"]
+        )
+
+    async def test_tool_call_timeout(self):
+        self.bot.register_external_tools(SleepyTools())
+        result = await self.bot._call_function("oversleep", "{}")
+        self.assertEqual(result, "Function oversleep timed out.")
+
+    async def test_truncated_tool_arguments_still_get_a_tool_result(self):
+        self.bot.register_external_tools(SleepyTools())
+        truncated = make_tool_call("call_1", "nap", arguments='{"seconds": 1')
+        self.create.side_effect = [
+            make_response(tool_calls=[truncated]),
+            make_response("sorry"),
+        ]
+
+        self.assertEqual(await self.bot.send_message(1, "sleep"), "sorry")
+        history = self.bot.store.load(1)
+        self.assertEqual(
+            [m["role"] for m in history], ["user", "assistant", "tool", "assistant"]
+        )
+        self.assertEqual(history[2]["tool_call_id"], "call_1")
+        self.assertEqual(
+            history[2]["content"], "Function nap failed: invalid arguments"
+        )
+
+    def test_duplicate_tool_names_are_rejected(self):
+        self.bot.register_external_tools(SleepyTools())
+        with self.assertRaises(ValueError):
+            self.bot.register_external_tools(SleepyTools())
+
+    async def test_deferred_tools_are_built_on_first_call(self):
+        built = []
+
+        def factory():
+            built.append(SleepyTools())
+            return built[-1]
+
+        self.bot.register_deferred_tools(SleepyTools, factory)
+        self.assertIn("nap", self.bot.registry)
+        self.assertEqual(built, [])
+
+        self.assertEqual(await self.bot._call_function("nap", "{}"), "nap done")
+        await self.bot._call_function("nap", "{}")
+        self.assertEqual(len(built), 1)
+
+    def test_tools_schema_is_built_once(self):
+        tools = self.bot.registry.tools
+        self.bot.register_external_tools(SleepyTools())
+        self.assertIsInstance(self.bot.registry.tools, tuple)
+        self.assertEqual(
+            [tool["function"]["name"] for tool in self.bot.registry.tools],
+            [tool["function"]["name"] for tool in tools] + ["nap", "oversleep"],
+        )
+
+    async def test_stream_message_yields_deltas_and_runs_streamed_tool_calls(self):
+        self.bot.register_external_tools(SleepyTools())
+        self.create.side_effect = [
+            make_stream(
+                make_chunk(tool_calls=[make_tool_call_fragment(0, "call_1", "na")]),
+                make_chunk(tool_calls=[make_tool_call_fragment(0, name="p")]),
+                make_chunk(tool_calls=[make_tool_call_fragment(0, arguments="{")]),
+                make_chunk(tool_calls=[make_tool_call_fragment(0, arguments="}")]),
+            ),
+            make_stream(make_chunk("well "), make_chunk("rested")),
+        ]
+
+        chunks = [chunk async for chunk in self.bot.stream_message(1, "sleep")]
+
+        self.assertEqual(chunks, ["well ", "rested"])
+        self.assertTrue(self.create.call_args.kwargs["stream"])
+        history = self.bot.store.load(1)
+        self.assertEqual(
+            history[1]["tool_calls"][0],
+            {
+                "id": "call_1",
+                "type": "function",
+                "function": {"name": "nap", "arguments": "{}"},
+            },
+        )
+        self.assertEqual(history[2]["content"], "nap done")
+        self.assertEqual(history[3], {"role": "assistant", "content": "well rested"})
+
+    async def test_endless_tool_calls_are_cut_off(self):
+        self.bot.max_tool_rounds = 2
+
+        async def create(**params):
+            if params.get("tool_choice") == "none":
+                return make_response("giving up")
+            return make_response(tool_calls=[make_tool_call("call", "nap")])
+
+        self.bot.register_external_tools(SleepyTools())
+        self.create.side_effect = create
+
+        self.assertEqual(await self.bot.send_message(1, "sleep"), "giving up")
+        self.assertEqual(self.create.await_count, 3)
+
+    async def test_token_budget_forces_a_final_answer(self):
+        self.bot.max_turn_tokens = 100
+        response = make_response(tool_calls=[make_tool_call("call", "nap")])
+        response.usage = SimpleNamespace(
+            prompt_tokens=100, completion_tokens=50, total_tokens=150
+        )
+        self.bot.register_external_tools(SleepyTools())
+        self.create.side_effect = [response, response]
+
+        await self.bot.send_message(1, "sleep")
+
+        self.assertEqual(self.create.call_args.kwargs["tool_choice"], "none")
+        # tool calls of the forced answer are not left unanswered in the history
+        self.assertNotIn("tool_calls", self.bot.store.load(1)[-1])
+
+    def test_cache_scope_is_fingerprinted_once_per_tool_set(self):
+        with patch("transformers.gpt.hashlib.sha256", wraps=hashlib.sha256) as sha256:
+            scope = self.bot._cache_scope("gpt-4o-mini")
+            self.assertEqual(self.bot._cache_scope("gpt-4o-mini"), scope)
+            self.assertEqual(sha256.call_count, 1)
+
+            self.bot.register_external_tools(SleepyTools())
+            self.assertNotEqual(self.bot._cache_scope("gpt-4o-mini"), scope)
+            self.assertEqual(sha256.call_count, 2)
+
+    async def test_slow_requests_are_cut_off_by_the_turn_time(self):
+        self.bot.max_turn_seconds = 0.05
+        self.bot.MIN_REQUEST_SECONDS = 0.05
+
+        async def create(**params):
+            await asyncio.sleep(10)
+
+        self.create.side_effect = create
+
+        started = time.perf_counter()
+        reply = await self.bot.send_message(1, "hello")
+        self.assertEqual(reply, OpenAIChatBot.UNAVAILABLE_REPLY)
+        self.assertLess(time.perf_counter() - started, 1)
+
+    async def test_stalled_streams_are_cut_off_by_the_turn_time(self):
+        self.bot.max_turn_seconds = 0.05
+        self.bot.MIN_REQUEST_SECONDS = 0.05
+
+        async def stalled():
+            yield make_chunk("Hel")
+            await asyncio.sleep(10)
+            yield make_chunk("lo")
+
+        self.create.return_value = stalled()
+
+        started = time.perf_counter()
+        chunks = [chunk async for chunk in self.bot.stream_message(1, "hello")]
+        self.assertEqual(chunks, ["Hel", OpenAIChatBot.UNAVAILABLE_REPLY])
+        self.assertLess(time.perf_counter() - started, 1)
+
+    async def test_standalone_prompts_are_answered_from_cache(self):
+        self.bot.response_cache = ResponseCache()
+        self.create.side_effect = [make_response("Paris"), make_response("Lyon")]
+
+        self.assertEqual(await self.bot.send_message(1, "Capital of France?"), "Paris")
+        self.assertEqual(await self.bot.send_message(2, "capital of france"), "Paris")
+        self.assertEqual(self.create.await_count, 1)
+        self.assertEqual(len(self.bot.store.load(2)), 2)
+
+        # follow-up messages depend on the conversation and are not cached
+        self.assertEqual(await self.bot.send_message(2, "capital of france"), "Lyon")
+        self.assertEqual(self.bot.response_cache.hit_rate, 0.5)
+
+    async def test_long_histories_are_summarized_after_the_reply(self):
+        self.bot.HISTORY_TOKEN_BUDGETS = {"gpt-4o-mini": 400}
+        for i in range(10):
+            self.bot.store.append(
+                1,
+                [
+                    {"role": "user", "content": f"question {i} " + "x" * 80},
+                    {"role": "assistant", "content": f"answer {i} " + "y" * 80},
+                ],
+            )
+        self.create.side_effect = [
+            make_response("latest answer"),
+            make_response("they asked ten questions"),
+        ]
+
+        self.assertEqual(await self.bot.send_message(1, "one more"), "latest answer")
+        # the reply does not wait for the summary
+        self.assertEqual(self.create.await_count, 1)
+        await self.bot.wait_background_tasks()
+
+        history = self.bot.store.load(1)
+        self.assertEqual(history[0]["role"], "system")
+        self.assertTrue(history[0]["content"].endswith("they asked ten questions"))
+        self.assertEqual(history[-1]["content"], "latest answer")
+        self.assertLessEqual(self.bot.store.token_count(1), 200)
+
+    async def test_summaries_are_not_retried(self):
+        self.bot.HISTORY_TOKEN_BUDGETS = {"gpt-4o-mini": 100}
+        self.bot.store.append(
+            1, [{"role": "user", "content": "x" * 200} for _ in range(3)]
+        )
+        self.create.side_effect = make_timeout()
+
+        await self.bot._summarize_history(1, "gpt-4o-mini", 100)
+        self.assertEqual(self.create.await_count, 1)
+        self.assertEqual(len(self.bot.store.load(1)), 3)
+
+    async def test_failed_summaries_do_not_fail_the_turn(self):
+        self.bot.HISTORY_TOKEN_BUDGETS = {"gpt-4o-mini": 100}
+        self.bot.store.append(
+            1, [{"role": "user", "content": "x" * 200} for _ in range(3)]
+        )
+        self.bot.store.replace = MagicMock(side_effect=OSError("disk full"))
+        self.create.return_value = make_response("summary")
+
+        self.bot._schedule_summary(1, "gpt-4o-mini")
+        with self.assertLogs("OpenAIChatBot", "ERROR"):
+            await self.bot.wait_background_tasks()
+
+    async def test_summary_is_dropped_when_history_changed(self):
+        self.bot.HISTORY_TOKEN_BUDGETS = {"gpt-4o-mini": 100}
+        self.bot.store.append(
+            1, [{"role": "user", "content": "x" * 200} for _ in range(3)]
+        )
+
+        async def create(**params):
+            self.bot._clear_history(1)
+            return make_response("summary")
+
+        self.create.side_effect = create
+        await self.bot._summarize_history(1, "gpt-4o-mini", 100)
+        self.assertEqual(len(self.bot.store.load(1)), 1)
+
+    async def test_records_request_tool_and_token_metrics(self):
+        sink = metrics.sink = InMemorySink()
+        self.addCleanup(setattr, metrics, "sink", None)
+        self.bot.register_external_tools(SleepyTools())
+        usage = SimpleNamespace(prompt_tokens=20, completion_tokens=5, total_tokens=25)
+        first = make_response(tool_calls=[make_tool_call("call", "nap")])
+        second = make_response("rested")
+        first.usage = second.usage = usage
+        self.create.side_effect = [first, second]
+
+        await self.bot.send_message(1, "sleep")
+
+        self.assertEqual(len(sink.values("openai.request")), 2)
+        self.assertEqual(sink.total("openai.prompt_tokens"), 40)
+        self.assertEqual(sink.total("openai.completion_tokens"), 10)
+        self.assertEqual(sink.values("turn.tool_rounds"), [1])
+        (record,) = [r for r in sink.records if r.name == "tool.call"]
+        self.assertEqual(record.dimensions, {"tool": "nap"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import openai
+import unittest
+
+from unittest.mock import AsyncMock
+from utils import CircuitBreaker
+from transformers import OpenAIChatBot, RequestGuard
+from transformers import UpstreamUnavailableError, CircuitOpenError
+from .helpers import make_client, make_error, make_response
+
+
+class TestRequestGuard(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.delays = []
+        self.guard = RequestGuard(max_retries=3, sleep=self.sleep)
+
+    async def sleep(self, seconds):
+        self.delays.append(seconds)
+
+    async def test_retries_transient_errors_with_backoff(self):
+        request = AsyncMock(side_effect=[make_error(500), make_error(503), "ok"])
+
+        self.assertEqual(await self.guard.run(request), "ok")
+        self.assertEqual(request.await_count, 3)
+        self.assertEqual(len(self.delays), 2)
+        self.assertLessEqual(self.delays[1], RequestGuard.BASE_DELAY * 2)
+
+    async def test_honors_retry_after(self):
+        request = AsyncMock(
+            side_effect=[
+                make_error(429, {"retry-after": "2"}),
+                make_error(429, {"retry-after-ms": "1500"}),
+                "ok",
+            ]
+        )
+        await self.guard.run(request)
+        self.assertEqual(self.delays, [2.0, 1.5])
+
+    async def test_gives_up_when_retry_after_is_too_long(self):
+        request = AsyncMock(side_effect=make_error(429, {"retry-after": "600"}))
+        with self.assertRaises(UpstreamUnavailableError):
+            await self.guard.run(request)
+        request.assert_awaited_once()
+
+    async def test_client_errors_are_not_retried(self):
+        request = AsyncMock(side_effect=make_error(400))
+        with self.assertRaises(openai.APIStatusError):
+            await self.guard.run(request)
+        request.assert_awaited_once()
+
+    async def test_fails_fast_while_the_circuit_is_open(self):
+        self.guard.breaker = CircuitBreaker(failure_threshold=1)
+        request = AsyncMock(side_effect=make_error(502))
+        with self.assertRaises(UpstreamUnavailableError):
+            await self.guard.run(request)
+        self.assertEqual(request.await_count, 4)
+
+        with self.assertRaises(CircuitOpenError):
+            await self.guard.run(request)
+        self.assertEqual(request.await_count, 4)
+
+
+class TestOpenAIChatBotUnavailable(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.create = AsyncMock(side_effect=make_error(503))
+        self.bot = OpenAIChatBot("test-key", guard=RequestGuard(max_retries=0))
+        self.bot.client = make_client(self.create)
+
+    async def test_send_message_returns_canned_reply(self):
+        reply = await self.bot.send_message(1, "hello")
+        self.assertEqual(reply, OpenAIChatBot.UNAVAILABLE_REPLY)
+
+        # the history is kept for the next attempt
+        self.create.side_effect = [make_response("hi")]
+        self.assertEqual(await self.bot.send_message(1, "hello?"), "hi")
+
+    async def test_stream_message_yields_canned_reply(self):
+        chunks = [chunk async for chunk in self.bot.stream_message(1, "hello")]
+        self.assertEqual(chunks, [OpenAIChatBot.UNAVAILABLE_REPLY])
@@ -0,0 +1,98 @@
+import unittest
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+from transformers import OpenAIChatBot, RequestGuard, ModelRouter, RoutingRule
+from utils import ResponseCache, InMemorySink, metrics
+from .helpers import make_client, make_response, make_timeout
+
+
+class TestModelRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = ModelRouter(
+            [
+                RoutingRule("gpt-4o", min_prompt_tokens=100),
+                RoutingRule("gpt-4o", min_history_tokens=4000),
+                RoutingRule("gpt-4o-tools", needs_tools=True),
+            ]
+        )
+
+    def route(self, prompt, history_tokens=0):
+        return self.router.route(self.router.features(prompt, history_tokens))
+
+    def test_short_prompts_use_the_default_model(self):
+        self.assertEqual(self.route("hello there"), ModelRouter.DEFAULT_MODEL)
+
+    def test_long_prompts_and_histories_escalate(self):
+        self.assertEqual(self.route("word " * 200), "gpt-4o")
+        self.assertEqual(self.route("hello", history_tokens=5000), "gpt-4o")
+
+    def test_prompts_needing_tools(self):
+        self.assertEqual(self.route("what time is it?"), "gpt-4o-tools")
+        self.assertEqual(self.route("summarize https://example.com"), "gpt-4o-tools")
+
+
+class TestOpenAIChatBotRouting(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.create = AsyncMock()
+        self.bot = OpenAIChatBot(
+            "test-key",
+            guard=RequestGuard(sleep=AsyncMock()),
+            router=ModelRouter(
+                [RoutingRule("gpt-4o", min_prompt_tokens=100)],
+                fallbacks={"gpt-4o": "gpt-4o-mini"},
+                params={"gpt-4o": {"max_tokens": 1024}},
+            ),
+        )
+        self.bot.client = make_client(self.create)
+
+    async def test_uses_routed_model_and_its_params(self):
+        self.create.return_value = make_response("ok")
+        await self.bot.send_message(1, "word " * 200)
+
+        params = self.create.call_args.kwargs
+        self.assertEqual((params["model"], params["max_tokens"]), ("gpt-4o", 1024))
+
+    async def test_falls_back_to_secondary_model_on_timeout(self):
+        self.create.side_effect = [make_timeout(), make_response("ok")]
+
+        self.assertEqual(await self.bot.send_message(1, "word " * 200), "ok")
+        self.assertEqual(
+            [call.kwargs["model"] for call in self.create.await_args_list],
+            ["gpt-4o", "gpt-4o-mini"],
+        )
+
+    async def test_fallback_gets_its_own_history_budget(self):
+        self.bot.HISTORY_TOKEN_BUDGETS = {"gpt-4o": 8000, "gpt-4o-mini": 200}
+        self.bot.store.append(
+            1,
+            [
+                {"role": "user", "content": "earlier " * 100},
+                {"role": "assistant", "content": "sure"},
+            ],
+        )
+        self.create.side_effect = [make_timeout(), make_response("ok")]
+
+        self.assertEqual(await self.bot.send_message(1, "word " * 200), "ok")
+
+        primary, fallback = self.create.await_args_list
+        self.assertEqual(len(primary.kwargs["messages"]), 4)
+        self.assertEqual(len(fallback.kwargs["messages"]), 2)
+
+    async def test_fallback_answers_are_recorded_under_the_fallback(self):
+        sink = metrics.sink = InMemorySink()
+        self.addCleanup(setattr, metrics, "sink", None)
+        self.bot.response_cache = ResponseCache()
+        reply = make_response("ok")
+        reply.usage = SimpleNamespace(
+            prompt_tokens=10, completion_tokens=2, total_tokens=12
+        )
+        self.create.side_effect = [make_timeout(), reply]
+
+        self.assertEqual(await self.bot.send_message(1, "word " * 200), "ok")
+
+        tokens = [r for r in sink.records if r.name == "openai.prompt_tokens"]
+        self.assertEqual([r.dimensions for r in tokens], [{"model": "gpt-4o-mini"}])
+        # the reply is cached for the model that gave it
+        scope = self.bot._cache_scope("gpt-4o-mini")
+        self.assertEqual(self.bot.response_cache.get(scope, "word " * 200), "ok")